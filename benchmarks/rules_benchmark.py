@@ -0,0 +1,123 @@
+"""
+Measure the cost of discovering the firing rules ([_get_rules] and [_parse_rules]) for features tables of different shapes:
+number of rows, ratio of positive observations, and maximum number of rules. The features tables are generated with the
+columns [_compute_features_table] produces with the default features, planting a two-rule firing behavior in the positive
+observations, so the quality of the discovered rules (confidence and support) is recorded along with the times.
+
+    python benchmarks/rules_benchmark.py [--rows 250 1000 4000] [--positive-ratios 0.2 0.33 0.5] [--max-rules 1 3 5]
+                                         [--repetitions 3] [--output results.csv] [--baseline previous_results.csv]
+"""
+import argparse
+import statistics
+import sys
+import time
+import warnings
+from datetime import datetime
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from batch_processing_discovery.rules import _get_rules, _parse_rules
+
+RESULTS_DIR = Path(__file__).parent / "results"
+KEYS = ["rows", "positive_ratio", "max_rules"]
+
+
+def _generate_features_table(num_rows: int, positive_ratio: float, rng: np.random.Generator) -> pd.DataFrame:
+    """
+    Generate a features table with the shape of the ones computed by [_compute_features_table] with the default features.
+    Most of the positive observations (batch firing) follow one of two rules: the batch reaching 4+ activity instances, or
+    the batch waiting since more than 8h during working hours; the rest of them, and the negative ones, are random.
+    """
+    num_positives = max(1, int(round(num_rows * positive_ratio)))
+    num_negatives = num_rows - num_positives
+    # Negative observations: small batches waiting for a short time
+    negatives = pd.DataFrame({
+        'batch_size': rng.integers(1, 4, num_negatives),
+        'batch_ready_wt': rng.exponential(3600, num_negatives),
+        'week_day': rng.integers(0, 7, num_negatives),
+        'daily_hour': rng.integers(0, 24, num_negatives),
+    })
+    # Positive observations: half following each rule, 10% of them random
+    follows_size = rng.random(num_positives) < 0.5
+    is_random = rng.random(num_positives) < 0.1
+    positives = pd.DataFrame({
+        'batch_size': np.where(follows_size, rng.integers(4, 8, num_positives), rng.integers(1, 4, num_positives)),
+        'batch_ready_wt': np.where(follows_size, rng.exponential(3600, num_positives), rng.uniform(8, 12, num_positives) * 3600),
+        'week_day': rng.integers(0, 5, num_positives),
+        'daily_hour': np.where(follows_size, rng.integers(0, 24, num_positives), rng.integers(9, 17, num_positives)),
+    })
+    positives.loc[is_random, 'batch_size'] = rng.integers(1, 4, is_random.sum())
+    positives.loc[is_random, 'batch_ready_wt'] = rng.exponential(3600, is_random.sum())
+    positives.loc[is_random, 'daily_hour'] = rng.integers(0, 24, is_random.sum())
+    features_table = pd.concat([positives.assign(outcome=1), negatives.assign(outcome=0)], ignore_index=True)
+    # The max waiting time is, at least, the waiting time since the batch is ready
+    features_table['batch_max_wt'] = features_table['batch_ready_wt'] + rng.exponential(1800, num_rows)
+    features_table = features_table[['batch_size', 'batch_ready_wt', 'batch_max_wt', 'week_day', 'daily_hour', 'outcome']]
+    return features_table.sample(frac=1.0, random_state=0).reset_index(drop=True)
+
+
+def _run(rows: list, positive_ratios: list, max_rules_values: list, repetitions: int, seed: int) -> pd.DataFrame:
+    results = []
+    for num_rows in rows:
+        for positive_ratio in positive_ratios:
+            features_table = _generate_features_table(num_rows, positive_ratio, np.random.default_rng(seed))
+            for max_rules in max_rules_values:
+                get_rules_times, parse_rules_times = [], []
+                for _ in range(repetitions):
+                    start = time.perf_counter()
+                    discovered_rules = _get_rules(features_table, 'outcome', max_rules=max_rules)
+                    get_rules_times += [time.perf_counter() - start]
+                    start = time.perf_counter()
+                    rules = _parse_rules(discovered_rules['model']) if len(discovered_rules) > 0 else []
+                    parse_rules_times += [time.perf_counter() - start]
+                results += [{
+                    'rows': num_rows,
+                    'positive_ratio': positive_ratio,
+                    'max_rules': max_rules,
+                    'get_rules_s': statistics.median(get_rules_times),
+                    'parse_rules_s': statistics.median(parse_rules_times),
+                    'num_rules': len(rules),
+                    'confidence': discovered_rules.get('confidence', np.nan),
+                    'support': discovered_rules.get('support', np.nan),
+                }]
+                print("rows={:<6} positive_ratio={:<5} max_rules={:<3} get_rules={:.3f}s parse_rules={:.5f}s rules={}".format(
+                    num_rows, positive_ratio, max_rules, results[-1]['get_rules_s'], results[-1]['parse_rules_s'], len(rules)
+                ), file=sys.stderr)
+    return pd.DataFrame(results)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, nargs="+", default=[250, 1000, 4000], help="number of rows of the features tables.")
+    parser.add_argument("--positive-ratios", type=float, nargs="+", default=[0.2, 0.33, 0.5],
+                        help="ratio of positive observations in the features tables.")
+    parser.add_argument("--max-rules", type=int, nargs="+", default=[1, 3, 5], help="maximum number of rules to discover.")
+    parser.add_argument("--repetitions", type=int, default=3, help="number of times to run each configuration (median).")
+    parser.add_argument("--seed", type=int, default=42, help="seed to generate the features tables.")
+    parser.add_argument("--output", type=Path,
+                        help="CSV file to record the results in (default: benchmarks/results/rules_benchmark_<date>.csv).")
+    parser.add_argument("--baseline", type=Path, help="CSV file with previous results to compare the times with.")
+    args = parser.parse_args()
+    with warnings.catch_warnings():
+        # RIPPER warns when a shrinking table has no positive observations left
+        warnings.simplefilter("ignore")
+        results = _run(args.rows, args.positive_ratios, args.max_rules, args.repetitions, args.seed)
+    # Record the results
+    output = args.output or RESULTS_DIR / "rules_benchmark_{}.csv".format(datetime.now().strftime("%Y%m%d_%H%M%S"))
+    output.parent.mkdir(parents=True, exist_ok=True)
+    results.to_csv(output, index=False)
+    print("Results recorded in {}".format(output), file=sys.stderr)
+    # Compare with the baseline
+    if args.baseline is not None:
+        baseline = pd.read_csv(args.baseline)
+        results = results.merge(baseline, on=KEYS, how="left", suffixes=("", "_baseline"))
+        results['get_rules_speedup'] = results['get_rules_s_baseline'] / results['get_rules_s']
+        results['support_change'] = results['support'] - results['support_baseline']
+        results = results[KEYS + ['get_rules_s', 'get_rules_s_baseline', 'get_rules_speedup', 'num_rules', 'support_change']]
+    print(results.to_string(index=False))
+
+
+if __name__ == "__main__":
+    main()
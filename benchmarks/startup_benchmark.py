@@ -0,0 +1,56 @@
+"""
+Measure the time to start a new process importing the modules of the package (or tagging the batches of a small event log),
+and check which heavy dependencies each of them loads. Short-lived processes tagging batches should only load pandas/numpy.
+
+    python benchmarks/startup_benchmark.py [--runs 10]
+"""
+import argparse
+import statistics
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+EVENT_LOG = Path(__file__).parent.parent / "tests" / "assets" / "event_log_1.csv"
+STATEMENTS = {
+    "baseline (pandas)": "import pandas",
+    "discovery": "import batch_processing_discovery.discovery",
+    "batch_characteristics": "import batch_processing_discovery.batch_characteristics",
+    "cli": "import batch_processing_discovery.cli",
+    "first discover_batches call": (
+        "import pandas as pd\n"
+        "from batch_processing_discovery.config import DEFAULT_CSV_IDS\n"
+        "from batch_processing_discovery.discovery import discover_batches\n"
+        "discover_batches(pd.read_csv({!r}), DEFAULT_CSV_IDS)".format(str(EVENT_LOG))
+    ),
+    "rules dependencies (wittgenstein)": "import wittgenstein",
+}
+HEAVY_DEPENDENCIES = ["wittgenstein", "numba", "sklearn", "scipy"]
+
+
+def _measure(statement: str, runs: int) -> tuple:
+    times = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        subprocess.run([sys.executable, "-c", statement], check=True)
+        times += [time.perf_counter() - start]
+    # Heavy dependencies loaded by the statement
+    output = subprocess.run(
+        [sys.executable, "-c", "import sys\n{}\nprint(' '.join(sys.modules))".format(statement)],
+        capture_output=True, text=True, check=True
+    ).stdout.split()
+    return times, [dependency for dependency in HEAVY_DEPENDENCIES if dependency in output]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=10, help="number of processes to start for each statement.")
+    args = parser.parse_args()
+    print("{:<36} {:>10} {:>10}  {}".format("statement", "median (s)", "min (s)", "heavy dependencies loaded"))
+    for name, statement in STATEMENTS.items():
+        times, loaded = _measure(statement, args.runs)
+        print("{:<36} {:>10.3f} {:>10.3f}  {}".format(name, statistics.median(times), min(times), ", ".join(loaded) or "-"))
+
+
+if __name__ == "__main__":
+    main()
@@ -1 +1 @@
-__all__ = ['batch_characteristics', 'discovery', 'config']
+__all__ = ['batch_characteristics', 'cli', 'discovery', 'config', 'parallel', 'preprocessing', 'sampling', 'service']
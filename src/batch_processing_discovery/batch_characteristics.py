@@ -1,18 +1,28 @@
+from math import lgamma
+from typing import Optional
+
+import numpy as np
 import pandas as pd
-from numpy import mean
 
 from .config import EventLogIDs
 from .discovery import discover_batches
-from .features_table import _compute_features_table
+from .features_table import _compute_features_table, _get_feature_columns, DEFAULT_FEATURES, FeaturesContext
+from .kernels import _to_int64_ns
 from .rules import _get_rules, _parse_rules
 
+# Minimum number of durations to consider the uniform distribution when fitting them, as its boundaries (the min and max of
+# the sample) overfit small samples (e.g., with 2 durations, its likelihood is always the highest)
+UNIFORM_MIN_COUNT = 10
+
 
 def discover_batch_processing_and_characteristics(
         event_log: pd.DataFrame,
         log_ids: EventLogIDs,
         batch_min_size: int = 2,
         max_sequential_gap: pd.Timedelta = pd.Timedelta(0),
-        resource_aware: bool = False
+        resource_aware: bool = False,
+        features: Optional[list] = None,
+        invalid_timestamps: str = "repair"
 ) -> list:
     """
     Discover, from [event_log], the activities being processed as a batch, and the characteristics of the batches:
@@ -25,6 +35,7 @@ def discover_batch_processing_and_characteristics(
         - The distribution of the scaling factor of the duration, i.e., for each batch size, the scaling
         factor of the duration of the activity instances processed in that batch. For example, if the activity
         is processed in a 2-size batch, each activity instance lasts x0.7 what it lasts executed individually.
+        - The statistics of the duration of the activity instances for each batch size (see [_get_batch_statistics]).
         - The firing rules that better describe the start of the batch.
 
     :param event_log:           event log to discover the batches and their characteristics.
@@ -34,6 +45,10 @@ def discover_batch_processing_and_characteristics(
                                 instance and the next one to be considered as a batch.
     :param resource_aware:      (for characteristics extraction) if True, take into the account both the resource and the
                                 executed activity for the characteristics discovery.
+    :param features:            (for characteristics extraction) names of the features to discover the firing rules with (see
+                                [features_table.FEATURE_PROVIDERS]). By default, [features_table.DEFAULT_FEATURES].
+    :param invalid_timestamps:  (for discovery) how to handle the activity instances with invalid timestamps ("repair",
+                                "drop", "raise", or "ignore"), see [preprocessing.normalize_timestamps].
     :return: a list with the characteristics of each discovered batch.
 
     """
@@ -42,19 +57,26 @@ def discover_batch_processing_and_characteristics(
         event_log=event_log,
         log_ids=log_ids,
         batch_min_size=batch_min_size,
-        max_sequential_gap=max_sequential_gap
+        max_sequential_gap=max_sequential_gap,
+        invalid_timestamps=invalid_timestamps
     )
     # Get the characteristics of each bach
     batch_characteristics = discover_batch_characteristics(
         event_log=batched_event_log,
         log_ids=log_ids,
-        resource_aware=resource_aware
+        resource_aware=resource_aware,
+        features=features
     )
     # Return characteristics
     return batch_characteristics
 
 
-def discover_batch_characteristics(event_log: pd.DataFrame, log_ids: EventLogIDs, resource_aware: bool = False) -> list:
+def discover_batch_characteristics(
+        event_log: pd.DataFrame,
+        log_ids: EventLogIDs,
+        resource_aware: bool = False,
+        features: Optional[list] = None
+) -> list:
     """
     Get the characteristics of the batches present in in [event_log].
 
@@ -62,6 +84,8 @@ def discover_batch_characteristics(event_log: pd.DataFrame, log_ids: EventLogIDs
     :param log_ids:         mapping with the IDs of each column in the dataset.
     :param resource_aware:  if True, take into the account both the resource and the executed activity
                             for the rules discovery.
+    :param features:        names of the features to discover the firing rules with (see [features_table.FEATURE_PROVIDERS]).
+                            By default, [features_table.DEFAULT_FEATURES].
     :return: a list with the characteristics of each batch.
     """
     # Prepare datasets based on the type
@@ -69,22 +93,31 @@ def discover_batch_characteristics(event_log: pd.DataFrame, log_ids: EventLogIDs
         keys = [log_ids.activity, log_ids.resource]
     else:
         keys = [log_ids.activity]
+    # Columns needed to compute the features table (slim view of each group)
+    features_columns = [
+        log_ids.case, log_ids.activity, log_ids.resource, log_ids.enabled_time, log_ids.start_time, log_ids.batch_id, log_ids.batch_type
+    ]
+    features_columns += [
+        column for column in _get_feature_columns(DEFAULT_FEATURES if features is None else features)
+        if column not in features_columns
+    ]
+    # Indexes over the full event log, built only if a feature needs them
+    features_context = FeaturesContext(event_log, log_ids)
     # Calculate features per batch
     batches = []
-    for (group_key, grouped_instances) in event_log.groupby(keys):
-        batched_grouped_instances = grouped_instances[~pd.isna(grouped_instances[log_ids.batch_id])]
-        # If the activity is executed as a batch any time
+    for grouped_instances, batched_grouped_instances in _get_batched_groups(event_log, log_ids, keys):
+        # Only the groups executed as a batch at least once are retrieved
         if len(batched_grouped_instances) > 0:
-            # Get the batch size distribution and batch frequency
-            size_distribution = _get_size_distribution(grouped_instances, log_ids)
+            # Get the batch size and duration distributions, and batch frequency
+            batch_statistics = _get_batch_statistics(grouped_instances, log_ids)
+            size_distribution = batch_statistics['size_distribution']
             batch_frequency = (sum(size_distribution.values()) - size_distribution[1]) / sum(size_distribution.values())
-            # Get the batch duration distribution
-            duration_distribution = _get_duration_distribution(grouped_instances, log_ids)
             # Get the features table of the instances in this group
             features_table = _compute_features_table(
-                event_log=event_log,
-                batched_instances=batched_grouped_instances,
-                log_ids=log_ids
+                batched_instances=batched_grouped_instances[features_columns],
+                log_ids=log_ids,
+                features=features,
+                context=features_context
             ).drop([log_ids.batch_id, log_ids.batch_type, log_ids.resource, log_ids.activity, 'instant'], axis=1)
             # Get the activation rules
             firing_rules = {}
@@ -101,12 +134,74 @@ def discover_batch_characteristics(event_log: pd.DataFrame, log_ids: EventLogIDs
                     'type': batched_grouped_instances[log_ids.batch_type].mode().iloc[0],
                     'batch_frequency': batch_frequency,
                     'size_distribution': size_distribution,
-                    'duration_distribution': duration_distribution,
+                    'duration_distribution': batch_statistics['duration_distribution'],
+                    'duration_statistics': batch_statistics['duration_statistics'],
                     'firing_rules': firing_rules
                 }]
     return batches
 
 
+def get_simulation_parameters(batch_characteristics: list) -> list:
+    """
+    Transform the characteristics of the discovered batches into a compact, JSON-serializable, set of parameters to simulate
+    them: for each batch, the probability of each batch size, the scale factor of the duration and the fitted distribution of
+    the duration (in seconds) for each batch size, and the firing rules.
+
+    :param batch_characteristics:   list with the characteristics of each batch, as returned by [discover_batch_characteristics].
+
+    :return: a list with the simulation parameters of each batch.
+    """
+    simulation_parameters = []
+    for batch in batch_characteristics:
+        num_instances = sum(batch['size_distribution'].values())
+        simulation_parameters += [{
+            'activity': batch['activity'],
+            'resources': batch['resources'],
+            'type': batch['type'],
+            'batch_frequency': batch['batch_frequency'],
+            'size_probabilities': {
+                int(size): count / num_instances for size, count in sorted(batch['size_distribution'].items())
+            },
+            'duration_scale_factors': {int(size): float(factor) for size, factor in sorted(batch['duration_distribution'].items())},
+            'duration_distributions': {
+                int(size): statistics['distribution'] for size, statistics in sorted(batch['duration_statistics'].items())
+            },
+            'firing_rules': batch['firing_rules'].get('rules', [])
+        }]
+    return simulation_parameters
+
+
+def _get_batched_groups(event_log: pd.DataFrame, log_ids: EventLogIDs, keys: list):
+    """
+    Iterate over the groups of activity instances (given by [keys]) that have been executed as a batch at least once, without
+    grouping nor filtering the activity instances of the groups that are never batched.
+
+    :param event_log:   event log with the batch information already discovered.
+    :param log_ids:     mapping with the IDs of each column in the dataset.
+    :param keys:        list with the IDs of the columns to group the activity instances by.
+
+    :return: a generator of tuples with the activity instances of each group, and the batched activity instances of that group.
+    """
+    batched = ~pd.isna(event_log[log_ids.batch_id]).to_numpy()
+    # Keys of the groups with at least one batched activity instance
+    batched_keys = pd.MultiIndex.from_frame(event_log.loc[batched, keys]).unique()
+    if len(batched_keys) > 0:
+        # Positions of the activity instances belonging to these groups
+        in_batched_group = pd.MultiIndex.from_frame(event_log[keys]).isin(batched_keys)
+        group_positions = np.flatnonzero(in_batched_group)
+        relevant_instances = event_log.iloc[group_positions]
+        relevant_batched = batched[group_positions]
+        # Precompute the index of each group (sorted by key, as in a groupby)
+        group_codes = relevant_instances.groupby(keys).ngroup().to_numpy()
+        order = np.argsort(group_codes, kind="stable")
+        bounds = np.flatnonzero(np.diff(group_codes[order])) + 1
+        # Go over them using the precomputed index of each group
+        for positions in np.split(order, bounds):
+            if group_codes[positions[0]] >= 0:  # Skip NA keys
+                grouped_instances = relevant_instances.iloc[positions]
+                yield grouped_instances, grouped_instances[relevant_batched[positions]]
+
+
 def _get_size_distribution(event_log: pd.DataFrame, log_ids: EventLogIDs) -> dict:
     """
     Get, for each observed batch size (1 meaning not batched), the number of activity instances executed in batches of that size.
@@ -117,16 +212,7 @@ def _get_size_distribution(event_log: pd.DataFrame, log_ids: EventLogIDs) -> dic
 
     :return: a dict with the batch size as keys, and the number of activity instances executed in batches of that size as values.
     """
-    sizes = {}
-    # For each batched execution, increase one the count of their size
-    batched_executions = event_log[~pd.isna(event_log[log_ids.batch_id])]
-    for batch_id, events in batched_executions.groupby([log_ids.batch_id]):
-        batch_size = len(events)
-        sizes[batch_size] = sizes.get(batch_size, 0) + len(events)
-    # Add count of single executions
-    sizes[1] = len(event_log) - len(batched_executions)
-    # Return size distribution
-    return sizes
+    return _get_batch_statistics(event_log, log_ids)['size_distribution']
 
 
 def _get_duration_distribution(event_log: pd.DataFrame, log_ids: EventLogIDs) -> dict:
@@ -141,28 +227,134 @@ def _get_duration_distribution(event_log: pd.DataFrame, log_ids: EventLogIDs) ->
     :return: a dict with the batch size as keys, and the scale factor for the duration of the activity
     instances executed in batches of that size as values.
     """
-    # Copy log to edit
-    event_log_copy = event_log.copy()
-    # Set activity duration as new column
-    event_log_copy['duration'] = event_log_copy[log_ids.end_time] - event_log_copy[log_ids.start_time]
-    # Save durations of no batched activity instances
-    no_batched_durations = list(event_log_copy[pd.isna(event_log_copy[log_ids.batch_id])]['duration'])
-    # For each batch size, record its activity duration
-    batched_durations = {}
-    batched_executions = event_log_copy[~pd.isna(event_log_copy[log_ids.batch_id])]
-    for batch_id, events in batched_executions.groupby([log_ids.batch_id]):
-        batch_size = len(events)
-        batched_durations[batch_size] = batched_durations.get(batch_size, []) + list(events['duration'])
+    return _get_batch_statistics(event_log, log_ids)['duration_distribution']
+
+
+def _get_batch_statistics(event_log: pd.DataFrame, log_ids: EventLogIDs) -> dict:
+    """
+    Get, in a single grouped pass over the activity instances, the statistics of their batch sizes and durations:
+        - 'size_distribution': for each batch size (1 meaning not batched), the number of activity instances executed in
+        batches of that size.
+        - 'duration_distribution': for each batch size, the scale factor of the mean duration of the activity instances
+        executed in batches of that size w.r.t. the mean duration of the non batched ones.
+        - 'duration_statistics': for each batch size (1 meaning not batched), the statistics of the durations (in seconds)
+        of the activity instances executed in batches of that size: count, mean, variance, min, q25, median, q75, max, and
+        the best fitting distribution (see [_fit_distributions]).
+
+    :param event_log:       event log with the activity instances of the same activity, or of the same activity and performed by the
+                            same result (if [resource_aware] is true.
+    :param log_ids:         mapping with the IDs of each column in the dataset.
+
+    :return: a dict with the size distribution, the duration distribution, and the duration statistics.
+    """
+    # Size of the batch of each activity instance (0 for the non batched ones)
+    batch_ids = event_log[log_ids.batch_id]
+    batched = ~pd.isna(batch_ids).to_numpy()
+    sizes = np.zeros(len(event_log), dtype=np.int64)
+    sizes[batched] = batch_ids[batched].groupby(batch_ids[batched].to_numpy()).transform('size').to_numpy()
+    # Duration (in seconds) of each activity instance
+    durations = (_to_int64_ns(event_log[log_ids.end_time]) - _to_int64_ns(event_log[log_ids.start_time])) / 10 ** 9
+    with np.errstate(divide='ignore', invalid='ignore'):
+        log_durations = np.log(durations)
+    # Statistics of the durations per size
+    grouped = pd.DataFrame({'duration': durations, 'log_duration': log_durations}).groupby(sizes)
+    statistics = grouped['duration'].agg(['count', 'mean', 'var', 'min', 'max'])
+    statistics[['q25', 'median', 'q75']] = grouped['duration'].quantile([0.25, 0.5, 0.75]).unstack()
+    statistics['var'] = statistics['var'].fillna(0.0)
+    statistics['log_mean'] = grouped['log_duration'].mean()
+    statistics['log_var'] = grouped['log_duration'].var(ddof=0).fillna(0.0)
+    distributions = _fit_distributions(statistics)
+    # Compute size distribution (non batched instances are reported as size 1)
+    size_distribution = {int(size): int(count) for size, count in statistics['count'].items() if size > 0}
+    size_distribution[1] = int(statistics['count'].get(0, 0))
     # Compute scale factor of mean value
-    durations = {}
-    if len(no_batched_durations) > 0:
-        mean_no_batched = mean(no_batched_durations)
-        for size in batched_durations.keys():
-            durations[size] = mean(batched_durations[size]) / mean_no_batched
+    duration_distribution = {}
+    batched_statistics = statistics[statistics.index > 0]
+    if 0 in statistics.index and statistics.loc[0, 'count'] > 0:
+        for size, mean_duration in batched_statistics['mean'].items():
+            duration_distribution[int(size)] = float(mean_duration / statistics.loc[0, 'mean'])
     else:
         print("WARNING! No non-batched executions to learn duration scaling factor, setting 1.0 as default.")
-        for size in batched_durations.keys():
-            durations[size] = 1.0
-        pass
-    # Return durations
-    return durations
+        for size in batched_statistics.index:
+            duration_distribution[int(size)] = 1.0
+    # Transform statistics into dicts
+    duration_statistics = {}
+    for (size, size_statistics), distribution in zip(statistics.iterrows(), distributions):
+        if size == 1 and 0 in statistics.index:
+            continue  # Batches of one instance (not discovered by default) are reported together with the non batched ones
+        duration_statistics[max(int(size), 1)] = {
+            'count': int(size_statistics['count']),
+            'mean': float(size_statistics['mean']),
+            'variance': float(size_statistics['var']),
+            'min': float(size_statistics['min']),
+            'q25': float(size_statistics['q25']),
+            'median': float(size_statistics['median']),
+            'q75': float(size_statistics['q75']),
+            'max': float(size_statistics['max']),
+            'distribution': distribution
+        }
+    # Return statistics
+    return {
+        'size_distribution': size_distribution,
+        'duration_distribution': duration_distribution,
+        'duration_statistics': duration_statistics
+    }
+
+
+def _fit_distributions(statistics: pd.DataFrame) -> list:
+    """
+    Fit, for each row of [statistics], the distribution with the lowest Bayesian information criterion (i.e., the highest
+    log-likelihood penalized by the number of parameters) among the fixed value ('fix'), the normal ('norm'), exponential
+    ('expon'), log-normal ('lognorm'), gamma ('gamma'), and uniform ('uniform', only with [UNIFORM_MIN_COUNT] or more values),
+    computing all of them at once from the sufficient statistics of the data (maximum likelihood estimators, except for the
+    gamma, estimated with the method of moments).
+
+    :param statistics:  DataFrame with the 'count', 'mean', 'var' (sample variance), 'min', 'max', 'log_mean' (mean of the
+                        logarithms) and 'log_var' (variance of the logarithms) of each dataset.
+
+    :return: a list with, for each row, a dict with the name and the parameters of the fitted distribution.
+    """
+    n = statistics['count'].to_numpy(dtype=float)
+    mean, minimum, maximum = statistics['mean'].to_numpy(), statistics['min'].to_numpy(), statistics['max'].to_numpy()
+    var = statistics['var'].to_numpy() * np.where(n > 1, (n - 1) / np.maximum(n, 1), 0.0)  # Maximum likelihood variance
+    log_mean, log_var = statistics['log_mean'].to_numpy(), statistics['log_var'].to_numpy()
+    positive = minimum > 0
+    with np.errstate(divide='ignore', invalid='ignore'):
+        gamma_shape = np.where(var > 0, mean ** 2 / var, np.nan)
+        gamma_scale = np.where(mean > 0, var / mean, np.nan)
+        log_likelihoods = np.array([
+            # Normal
+            np.where(var > 0, -n / 2 * (np.log(2 * np.pi * var) + 1), -np.inf),
+            # Exponential
+            np.where((minimum >= 0) & (mean > 0), -n * np.log(mean) - n, -np.inf),
+            # Log-normal
+            np.where(positive & (log_var > 0), -n * log_mean - n / 2 * (np.log(2 * np.pi * log_var) + 1), -np.inf),
+            # Gamma
+            np.where(
+                positive & (var > 0),
+                (gamma_shape - 1) * n * log_mean - n * mean / gamma_scale - n * gamma_shape * np.log(gamma_scale) -
+                n * np.array([lgamma(shape) if shape > 0 else np.inf for shape in np.nan_to_num(gamma_shape)]),
+                -np.inf
+            ),
+            # Uniform
+            np.where((maximum > minimum) & (n >= UNIFORM_MIN_COUNT), -n * np.log(maximum - minimum), -np.inf),
+        ])
+        log_likelihoods = np.where(np.isnan(log_likelihoods), -np.inf, log_likelihoods)
+        num_parameters = np.array([2, 1, 2, 2, 2])[:, np.newaxis]
+        bics = num_parameters * np.log(n) - 2 * log_likelihoods
+    best = np.argmin(bics, axis=0)
+    distributions = []
+    for i in range(len(statistics)):
+        if var[i] <= 0 or np.all(np.isneginf(log_likelihoods[:, i])):
+            distributions += [{'name': 'fix', 'params': {'value': float(mean[i])}}]
+        elif best[i] == 0:
+            distributions += [{'name': 'norm', 'params': {'mean': float(mean[i]), 'std': float(np.sqrt(var[i]))}}]
+        elif best[i] == 1:
+            distributions += [{'name': 'expon', 'params': {'mean': float(mean[i])}}]
+        elif best[i] == 2:
+            distributions += [{'name': 'lognorm', 'params': {'mu': float(log_mean[i]), 'sigma': float(np.sqrt(log_var[i]))}}]
+        elif best[i] == 3:
+            distributions += [{'name': 'gamma', 'params': {'shape': float(gamma_shape[i]), 'scale': float(gamma_scale[i])}}]
+        else:
+            distributions += [{'name': 'uniform', 'params': {'min': float(minimum[i]), 'max': float(maximum[i])}}]
+    return distributions
@@ -0,0 +1,172 @@
+import argparse
+import json
+import sys
+import time
+from contextlib import contextmanager
+from dataclasses import fields
+from importlib.util import find_spec
+from pathlib import Path
+from typing import Optional
+
+import pandas as pd
+
+from .config import DEFAULT_CSV_IDS, EventLogIDs
+from .parallel import discover_batches_parallel
+from .preprocessing import INVALID_ROWS_POLICIES, _to_utc_timestamps
+
+OUTPUT_FORMATS = ["json", "csv", "parquet"]
+
+
+def main(argv: Optional[list] = None) -> int:
+    """
+    Command-line entry point to discover the batches of an event log (CSV or Parquet file). With the 'json' output format,
+    the characteristics of the batches are written (see [discover_batch_processing_and_characteristics]), while with the
+    'csv' and 'parquet' formats, the event log with the discovered batches is written (see [discover_batches]). Only the
+    former needs to discover the firing rules, so the rules discovery dependencies are only imported in that case.
+
+    :param argv:    command-line arguments (by default, the ones of the running process).
+    :return: the exit code of the process.
+    """
+    parser = _get_parser()
+    args = parser.parse_args(argv)
+    if args.format == "parquet" and args.output is None:
+        parser.error("the 'parquet' output format needs an output file (--output)")
+    if (args.format == "parquet" or args.event_log.suffix == ".parquet") and not _parquet_engine_available():
+        parser.error("reading or writing Parquet files needs pyarrow or fastparquet "
+                     "(pip install batch-processing-discovery[parquet])")
+    timings = {}
+    # Read event log
+    with _timed(timings, "read"):
+        log_ids = _read_log_ids(args.log_ids) if args.log_ids else DEFAULT_CSV_IDS
+        event_log = _read_event_log(args.event_log, log_ids, args.chunk_size)
+    # Discover the batches
+    with _timed(timings, "discovery"):
+        batched_event_log = discover_batches_parallel(
+            event_log=event_log,
+            log_ids=log_ids,
+            batch_min_size=args.batch_min_size,
+            max_sequential_gap=pd.Timedelta(args.max_sequential_gap, "s"),
+            invalid_timestamps=args.invalid_timestamps,
+            workers=args.workers
+        )
+    # Discover their characteristics and write the output
+    if args.format == "json":
+        with _timed(timings, "characteristics"):
+            # Imported here to not load the rules discovery dependencies when not needed
+            from .batch_characteristics import discover_batch_characteristics
+
+            batch_characteristics = discover_batch_characteristics(
+                event_log=batched_event_log,
+                log_ids=log_ids,
+                resource_aware=args.resource_aware,
+                features=args.features.split(",") if args.features else None
+            )
+        with _timed(timings, "write"):
+            _write_output(json.dumps(batch_characteristics, indent=2, default=_to_json_value), args.output)
+    else:
+        with _timed(timings, "write"):
+            if args.format == "parquet":
+                batched_event_log.to_parquet(args.output, index=False)
+            else:
+                _write_output(batched_event_log.to_csv(index=False), args.output)
+    # Report the execution times
+    if args.timing:
+        for stage, seconds in timings.items():
+            print("{}: {:.3f} s".format(stage, seconds), file=sys.stderr)
+        print("total: {:.3f} s".format(sum(timings.values())), file=sys.stderr)
+    return 0
+
+
+def _get_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(
+        prog="batch-processing-discovery",
+        description="Discover the activity instances executed as a batch in an event log, and the characteristics of the batches."
+    )
+    parser.add_argument("event_log", type=Path, help="path to the event log (CSV, optionally compressed, or Parquet).")
+    parser.add_argument("--log-ids", type=Path, help="path to a JSON file mapping the fields of EventLogIDs to the columns of "
+                                                     "the event log (by default, the ones in DEFAULT_CSV_IDS).")
+    parser.add_argument("-o", "--output", type=Path, help="path to write the output to (by default, the standard output).")
+    parser.add_argument("-f", "--format", choices=OUTPUT_FORMATS, default="json",
+                        help="'json' to write the characteristics of the batches, 'csv' or 'parquet' to write the event log "
+                             "with the discovered batches (default: json).")
+    parser.add_argument("--batch-min-size", type=int, default=2,
+                        help="minimum number of activity instances for a batch to be considered as such (default: 2).")
+    parser.add_argument("--max-sequential-gap", type=float, default=0.0,
+                        help="maximum time gap, in seconds, between the processing of two consecutive activity instances of "
+                             "a batch (default: 0).")
+    parser.add_argument("--invalid-timestamps", choices=INVALID_ROWS_POLICIES, default="repair",
+                        help="how to handle the activity instances with invalid timestamps (default: repair).")
+    parser.add_argument("--resource-aware", action="store_true",
+                        help="discover the characteristics of the batches for each activity and resource.")
+    parser.add_argument("--features", help="comma-separated names of the features to discover the firing rules with.")
+    parser.add_argument("-w", "--workers", type=int, default=1,
+                        help="number of processes to discover the batches with (default: 1).")
+    parser.add_argument("--chunk-size", type=int,
+                        help="read the CSV event log in chunks of this number of rows, parsing the timestamps of each chunk "
+                             "as it is read to reduce the memory usage.")
+    parser.add_argument("--timing", action="store_true", help="report the execution time of each stage in the standard error.")
+    return parser
+
+
+def _parquet_engine_available() -> bool:
+    return find_spec("pyarrow") is not None or find_spec("fastparquet") is not None
+
+
+def _read_log_ids(path: Path) -> EventLogIDs:
+    """
+    Read the mapping with the IDs of each column in the dataset from a JSON file, with the fields of [EventLogIDs] as keys.
+    The fields not present in the file take the value in [DEFAULT_CSV_IDS].
+    """
+    with open(path) as file:
+        mapping = json.load(file)
+    unknown_fields = set(mapping) - {field.name for field in fields(EventLogIDs)}
+    if len(unknown_fields) > 0:
+        raise ValueError("Unknown fields {} in the log IDs file, available ones are those of EventLogIDs.".format(
+            sorted(unknown_fields)
+        ))
+    return EventLogIDs(**{**DEFAULT_CSV_IDS.__dict__, **mapping})
+
+
+def _read_event_log(path: Path, log_ids: EventLogIDs, chunk_size: Optional[int] = None) -> pd.DataFrame:
+    """
+    Read the event log in [path] (Parquet if its extension is '.parquet', CSV otherwise). If [chunk_size] is set, the CSV is
+    read in chunks of [chunk_size] rows, parsing the timestamps of each chunk to not keep all of them as strings in memory.
+    """
+    if path.suffix == ".parquet":
+        return pd.read_parquet(path)
+    if chunk_size is None:
+        return pd.read_csv(path)
+    chunks = []
+    for chunk in pd.read_csv(path, chunksize=chunk_size):
+        for column in [log_ids.enabled_time, log_ids.start_time, log_ids.end_time]:
+            chunk[column] = _to_utc_timestamps(chunk[column])
+        chunks += [chunk]
+    return pd.concat(chunks, ignore_index=True)
+
+
+def _write_output(content: str, path: Optional[Path]):
+    if path is None:
+        sys.stdout.write(content)
+    else:
+        with open(path, "w") as file:
+            file.write(content)
+
+
+def _to_json_value(value):
+    # Transform the numpy and pandas values in the characteristics into JSON-serializable ones
+    if hasattr(value, "item"):
+        return value.item()
+    if pd.isna(value):
+        return None
+    return str(value)
+
+
+@contextmanager
+def _timed(timings: dict, stage: str):
+    start = time.perf_counter()
+    yield
+    timings[stage] = timings.get(stage, 0.0) + time.perf_counter() - start
+
+
+if __name__ == "__main__":
+    sys.exit(main())
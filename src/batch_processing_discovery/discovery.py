@@ -1,13 +1,20 @@
+import numpy as np
 import pandas as pd
 
 from .config import EventLogIDs, BatchType
+from .kernels import _get_sweep_line_kernel, _to_int64_ns
+from .preprocessing import normalize_timestamps
+
+# Code of each batch type in the int8 arrays used to classify them
+BATCH_TYPE_CODES = {BatchType.parallel: 0, BatchType.concurrent: 1, BatchType.sequential: 2}
 
 
 def discover_batches(
         event_log: pd.DataFrame,
         log_ids: EventLogIDs,
         batch_min_size: int = 2,
-        max_sequential_gap: pd.Timedelta = pd.Timedelta(0)
+        max_sequential_gap: pd.Timedelta = pd.Timedelta(0),
+        invalid_timestamps: str = "repair"
 ) -> pd.DataFrame:
     """
     Discover activity instance groups that has been processed as a batch. A batch is a set of activity instances
@@ -18,10 +25,16 @@ def discover_batches(
     :param batch_min_size:      minimum number of activity instances for a batch to be considered as such.
     :param max_sequential_gap:  maximum time gap (with no processing) between the processing of an activity
                                 instance and the next one to be considered as a batch.
-    :return: a copy of [event_log] with two extra columns, one denoting the ID of the batch and another one denoting
-             the processing type.
+    :param invalid_timestamps:  how to handle the activity instances with invalid timestamps ("repair", "drop", "raise", or
+                                "ignore"), see [normalize_timestamps].
+    :return: a copy of [event_log], with its timestamps normalized and without the activity instances dropped due to
+             invalid timestamps (see [normalize_timestamps]), with two extra columns, one denoting the ID of the batch and
+             another one denoting the processing type.
     """
-    batched_event_log = event_log.copy()
+    # Normalize the timestamps (no copy is performed when they are already normalized and valid)
+    batched_event_log = normalize_timestamps(event_log, log_ids, invalid_timestamps)
+    if batched_event_log is event_log:
+        batched_event_log = event_log.copy()
     # First phase: identify single activity batches
     _identify_single_activity_batches(batched_event_log, log_ids, batch_min_size, max_sequential_gap)
     # Second phase: identify subprocess batches
@@ -38,81 +51,58 @@ def _identify_single_activity_batches(
         batch_min_size: int,
         max_sequential_gap: pd.Timedelta
 ):
-    batches = []
-    # Group all the activity instances of the same activity and resource
-    for _, events in event_log.groupby([log_ids.resource, log_ids.activity]):
-        # Sweep line algorithm
-        batch_instance = []
-        for index, event in events.sort_values([log_ids.start_time]).iterrows():
-            if len(batch_instance) == 0:
-                # Add first event to the batch
-                batch_instance = [index]
-                batch_instance_start = event[log_ids.start_time]
-                batch_instance_end = event[log_ids.end_time]
-            else:
-                # Batch detection in process
-                if (event[log_ids.enabled_time] <= batch_instance_start and
-                        (event[log_ids.start_time] - batch_instance_end) <= max_sequential_gap):
-                    # Add event to batch
-                    batch_instance += [index]
-                    # Update batch end if necessary
-                    batch_instance_end = max(batch_instance_end, event[log_ids.end_time])
-                else:
-                    # Event not in batch: create current one if it fulfill the constraints
-                    if len(batch_instance) >= batch_min_size:
-                        batches += [batch_instance]
-                    # Start another batch instance candidate with new event
-                    batch_instance = [index]
-                    batch_instance_start = event[log_ids.start_time]
-                    batch_instance_end = event[log_ids.end_time]
-        # Process last iteration
-        if len(batch_instance) >= batch_min_size:
-            batches += [batch_instance]
-    # Assign a batch ID for each group
-    event_log[log_ids.batch_id] = pd.NA
-    indexes, ids = [], []
-    for batch_id, batch_indexes in enumerate(batches):
-        # Flatten list of batch indexes (lists)
-        indexes += batch_indexes
-        # For each index of this batch, add the batch ID
-        ids += [batch_id] * len(batch_indexes)
+    gap = pd.Timedelta(max_sequential_gap).value
+    enabled = _to_int64_ns(event_log[log_ids.enabled_time])
+    starts = _to_int64_ns(event_log[log_ids.start_time])
+    ends = _to_int64_ns(event_log[log_ids.end_time])
+    # Batch ID of each activity instance (-1 if not batched)
+    batch_ids = np.full(len(event_log), -1, dtype=np.int64)
+    # Sort the activity instances by (resource, activity) group, and by start time within each group
+    group_codes = event_log.groupby([log_ids.resource, log_ids.activity], sort=True).ngroup().to_numpy(dtype=float)
+    grouped = np.flatnonzero(~np.isnan(group_codes))  # Discard the ones with no resource or activity
+    order = grouped[np.lexsort((starts[grouped], group_codes[grouped]))]
+    group_bounds = np.flatnonzero(np.diff(group_codes[order])) + 1
+    # Sweep line algorithm over the events of each group
+    sweep_line_batches = _get_sweep_line_kernel(len(order))
+    num_batches = 0
+    for group_start, group_end in zip(np.r_[0, group_bounds], np.r_[group_bounds, len(order)]):
+        positions = order[group_start:group_end]
+        labels = sweep_line_batches(enabled[positions], starts[positions], ends[positions], gap, batch_min_size)
+        # Write the (global) batch ID of each batched activity instance
+        batched = labels >= 0
+        if batched.any():
+            batch_ids[positions[batched]] = labels[batched] + num_batches
+            num_batches += labels.max() + 1
     # Set IDs for batched columns
-    event_log.loc[indexes, log_ids.batch_id] = ids
-    event_log[log_ids.batch_id] = event_log[log_ids.batch_id].astype('Int64')
+    event_log[log_ids.batch_id] = pd.arrays.IntegerArray(batch_ids, batch_ids < 0)
 
 
 def _classify_batch_types(event_log: pd.DataFrame, log_ids: EventLogIDs):
-    # Set batch type to NA
-    event_log[log_ids.batch_type] = pd.NA
-    # Check the type of each batch and save the indexes of its events
-    indexes, types = [], []
-    for batch_id, batch_events in event_log[~pd.isna(event_log[log_ids.batch_id])].groupby([log_ids.batch_id]):
-        indexes += list(batch_events.index)
-        if _is_parallel_batch(batch_events, log_ids):
-            types += [BatchType.parallel] * len(batch_events)
-        elif _is_concurrent_batch(batch_events, log_ids):
-            types += [BatchType.concurrent] * len(batch_events)
-        else:
-            types += [BatchType.sequential] * len(batch_events)
-    # Set the batch types
-    event_log.loc[indexes, log_ids.batch_type] = types
-
-
-def _is_parallel_batch(batch_events: pd.DataFrame, log_ids: EventLogIDs) -> bool:
-    # If all events share start and end time, is parallel
-    return (len(batch_events[log_ids.start_time].unique()) == 1 and
-            len(batch_events[log_ids.end_time].unique()) == 1)
-
-
-def _is_concurrent_batch(batch_events: pd.DataFrame, log_ids: EventLogIDs) -> bool:
-    concurrent = False
-    # Sort events and take the start times
-    sorted_batch_events = batch_events.sort_values([log_ids.start_time, log_ids.end_time])
-    starts = list(sorted_batch_events[log_ids.start_time])
-    # Go over the end times checking if they do not overlap with the next batched event
-    for i, end in enumerate(sorted_batch_events[log_ids.end_time]):
-        if len(starts) > (i + 1) and starts[i + 1] < end:
-            # Overlapping, thus concurrent
-            concurrent = True
-    # Return result
-    return concurrent
+    # Batch type code of each activity instance (-1 if not batched)
+    type_codes = np.full(len(event_log), -1, dtype=np.int8)
+    batched = np.flatnonzero(~pd.isna(event_log[log_ids.batch_id]).to_numpy())
+    if len(batched) > 0:
+        batch_codes, _ = pd.factorize(event_log[log_ids.batch_id].iloc[batched])
+        starts = _to_int64_ns(event_log[log_ids.start_time])[batched]
+        ends = _to_int64_ns(event_log[log_ids.end_time])[batched]
+        # Sort the events of each batch by start and end time
+        order = np.lexsort((ends, starts, batch_codes))
+        batch_codes, starts, ends = batch_codes[order], starts[order], ends[order]
+        first = np.r_[0, np.flatnonzero(np.diff(batch_codes)) + 1]
+        # If all events share start and end time, is parallel
+        parallel = (
+                (np.minimum.reduceat(starts, first) == np.maximum.reduceat(starts, first)) &
+                (np.minimum.reduceat(ends, first) == np.maximum.reduceat(ends, first))
+        )
+        # If any of them starts before the end of the previous one, is concurrent
+        concurrent = np.zeros(len(first), dtype=bool)
+        overlap = (batch_codes[1:] == batch_codes[:-1]) & (starts[1:] < ends[:-1])
+        concurrent[batch_codes[1:][overlap]] = True
+        # Otherwise, is sequential
+        batch_types = np.where(parallel, BATCH_TYPE_CODES[BatchType.parallel], np.where(
+            concurrent, BATCH_TYPE_CODES[BatchType.concurrent], BATCH_TYPE_CODES[BatchType.sequential]
+        )).astype(np.int8)
+        type_codes[batched[order]] = batch_types[batch_codes]
+    # Set the batch types (NA if not batched)
+    batch_type_names = np.array(list(BATCH_TYPE_CODES) + [pd.NA], dtype=object)
+    event_log[log_ids.batch_type] = batch_type_names[type_codes]
@@ -1,15 +1,131 @@
 import random
+from dataclasses import dataclass
+from functools import cached_property
+from typing import Callable, Optional
 
 import numpy as np
 import pandas as pd
 
 from .config import EventLogIDs
+from .kernels import _from_int64_ns, _to_int64_ns
+
+
+class FeaturesContext:
+    """
+    Indexes over the full event log needed by some features (e.g., the first start of each case for the cycle time). Each
+    index is computed the first time a feature provider asks for it, and reused for all the groups of batch instances.
+    """
+
+    def __init__(self, event_log: pd.DataFrame, log_ids: EventLogIDs):
+        self.event_log = event_log
+        self.log_ids = log_ids
+
+    @cached_property
+    def case_first_start(self) -> pd.Series:
+        return _get_case_first_start(self.event_log, self.log_ids)
+
+    @cached_property
+    def activity_resource_times(self) -> "_SortedTimes":
+        return _SortedTimes(
+            self.event_log, [self.log_ids.activity, self.log_ids.resource], [self.log_ids.enabled_time, self.log_ids.start_time]
+        )
+
+    @cached_property
+    def resource_times(self) -> "_SortedTimes":
+        return _SortedTimes(self.event_log, [self.log_ids.resource], [self.log_ids.start_time, self.log_ids.end_time])
+
+    @cached_property
+    def resource_zero_duration_times(self) -> "_SortedTimes":
+        # Start times of the activity instances starting and ending at the same instant
+        zero_duration = _to_int64_ns(self.event_log[self.log_ids.start_time]) == _to_int64_ns(self.event_log[self.log_ids.end_time])
+        return _SortedTimes(self.event_log[zero_duration], [self.log_ids.resource], [self.log_ids.start_time])
+
+
+class _SortedTimes:
+    """
+    Timestamps of the activity instances of each group (e.g., of each resource), sorted by group and time, to count how many of
+    them happened before a set of instants with binary searches instead of filtering the event log per instant.
+    """
+
+    def __init__(self, event_log: pd.DataFrame, keys: list, columns: list):
+        index = pd.MultiIndex.from_frame(event_log[keys])
+        if len(index) > 0:
+            codes, self.keys = pd.factorize(index)
+        else:
+            # Factorizing an empty MultiIndex fails, no group to count in
+            codes, self.keys = np.zeros(0, dtype=np.int64), index
+        self.codes, self.times = {}, {}
+        for column in columns:
+            times = _to_int64_ns(event_log[column])
+            order = np.lexsort((times, codes))
+            self.codes[column], self.times[column] = codes[order], times[order]
+
+    def count(self, column: str, query_keys: pd.MultiIndex, instants: np.ndarray, side: str = "right") -> np.ndarray:
+        """
+        For each instant, count the activity instances of its group (given by [query_keys]) with a value of [column] lower than
+        (side="left") or lower or equal than (side="right") the instant.
+        """
+        return _count_at_or_before(self.codes[column], self.times[column], self.keys.get_indexer(query_keys), instants, side)
+
+
+@dataclass
+class Observations:
+    """
+    Instants (observations of the features table) to compute the features of, all at once. The batch cases of the batch
+    instance of the i-th observation that are enabled at its instant are 'batch_cases.iloc[first[i]:last[i] + 1]'.
+    """
+    instants: pd.DatetimeIndex  # Instant of each observation
+    batch_cases: pd.DataFrame  # Batched activity instances, sorted by batch instance and enabled time
+    first: np.ndarray  # Position in [batch_cases] of the first batch case of the batch instance of each observation
+    last: np.ndarray  # Position in [batch_cases] of the last batch case enabled at the instant of each observation
+    log_ids: EventLogIDs
+    context: Optional[FeaturesContext] = None
+
+    def at(self, column: str, positions: np.ndarray):
+        """
+        Get the values of [column] for the batch cases in [positions] (e.g., [first] or [last]).
+        """
+        return self.batch_cases[column].array.take(positions)
+
+
+# Functions computing, given the Observations, an array with the value of a feature for each observation
+FEATURE_PROVIDERS = {}
+# Columns of the event log (besides the ones always available to them, see [register_feature]) needed by each registered feature
+FEATURE_COLUMNS = {}
+# Features computed when none are specified
+DEFAULT_FEATURES = ['batch_size', 'batch_ready_wt', 'batch_max_wt', 'week_day', 'daily_hour']
+
+
+def register_feature(name: str, provider: Callable[[Observations], np.ndarray], columns: Optional[list] = None):
+    """
+    Register a feature (or replace an existing one) so it can be requested when computing the features table.
+
+    :param name:        name of the feature (column of the features table).
+    :param provider:    function receiving the [Observations] and returning an array with the value of the feature for each
+                        of them. Durations (timedelta values) are transformed to seconds in the features table.
+    :param columns:     columns of the event log the provider reads from [Observations.batch_cases] (e.g., a case attribute)
+                        besides the case, activity, resource, enabled time, start time, and batch ones, which are always
+                        available. Only these columns are kept in the batch cases when discovering the batch characteristics.
+    """
+    FEATURE_PROVIDERS[name] = provider
+    FEATURE_COLUMNS[name] = list(columns) if columns is not None else []
+
+
+def _get_feature_columns(features: list) -> list:
+    """
+    Get the (non-repeated) columns of the event log needed by [features] besides the ones always available to them.
+    """
+    columns = []
+    for feature in features:
+        columns += [column for column in FEATURE_COLUMNS.get(feature, []) if column not in columns]
+    return columns
 
 
 def _compute_features_table(
-        event_log: pd.DataFrame,
         batched_instances: pd.DataFrame,
         log_ids: EventLogIDs,
+        features: Optional[list] = None,
+        context: Optional[FeaturesContext] = None,
         num_batch_ready_negative_events: int = 2,
         num_batch_enabled_negative_events: int = 2
 ) -> pd.DataFrame:
@@ -17,9 +133,12 @@ def _compute_features_table(
     Create a DataFrame with the features of the batch-related events, classifying them into events that activate the batch and events
     that does not activate the batch.
 
-    :param event_log:                           full event log with the batch information already discovered.
     :param batched_instances:                   batched activity instances to extract the features out of them.
     :param log_ids:                             mapping with the IDs of each column in the dataset.
+    :param features:                            names of the features to compute (see [FEATURE_PROVIDERS]), [DEFAULT_FEATURES]
+                                                if None.
+    :param context:                             indexes over the full event log, needed by some features (e.g.,
+                                                'max_cycle_time').
     :param num_batch_ready_negative_events:     number of non-firing instants in between the batch enablement and firing.
     :param num_batch_enabled_negative_events:   number of non-firing instants from the enablement times of each case in the batch.
     :return: A Dataframe with the features of the events activating a batch.
@@ -34,100 +153,229 @@ def _compute_features_table(
     #   1 instance.
     # - The single instances could be executed individually just because the resource wanted, and not related to the firing rule
     #   being activated. Thus, consider them without knowing if they were thought to be a batch could hinder the rules discovery.
-    # Register features for each batch instance
-    features = []
-    for (key, batch_instance) in batched_instances.groupby([log_ids.batch_id]):
-        batch_instance_start = batch_instance[log_ids.start_time].min()
-        # Get features of the instant activating the batch instance
-        features += [
-            _get_features(
-                event_log,
-                batch_instance_start,
-                batch_instance,
-                1,  # Batch fired at this instant
-                log_ids
-            )
-        ]
-        # Get features of non-activating instants
-        non_activating_instants = []
-        # 1 - X events in between the ready time of the batch
-        batch_instance_enabled = batch_instance[log_ids.enabled_time].max()
-        non_activating_instants += pd.date_range(
-            start=batch_instance_enabled,
-            end=batch_instance_start,
-            periods=num_batch_ready_negative_events + 2
-        )[1:-1].tolist()
-        # 2 - Instants per enablement time of each case
-        enable_times = [instant for instant in batch_instance[log_ids.enabled_time] if instant < batch_instance_start]
+    features = DEFAULT_FEATURES if features is None else features
+    _check_features(features)
+    # Sort the batch cases by batch instance and enabled time
+    batch_codes = batched_instances.groupby(log_ids.batch_id).ngroup().to_numpy()
+    enabled = _to_int64_ns(batched_instances[log_ids.enabled_time])
+    order = np.lexsort((enabled, batch_codes))
+    batch_cases = batched_instances.iloc[order]
+    sorted_codes, sorted_enabled = batch_codes[order], enabled[order]
+    # Position of the first batch case of each batch instance, its size, and the instant it is fired
+    num_batches = sorted_codes[-1] + 1 if len(sorted_codes) > 0 else 0
+    firsts = np.searchsorted(sorted_codes, np.arange(num_batches))
+    sizes = np.bincount(sorted_codes, minlength=num_batches)
+    batch_instance_starts = pd.Series(_to_int64_ns(batched_instances[log_ids.start_time])).groupby(batch_codes).min().to_numpy()
+    # 1 - X non-activating instants in between the ready time of each batch instance and its firing
+    batch_instance_enabled = sorted_enabled[firsts + sizes - 1]
+    ready_instants = np.linspace(
+        0, batch_instance_starts - batch_instance_enabled, num_batch_ready_negative_events + 2, dtype=np.int64, axis=1
+    )[:, 1:-1] + batch_instance_enabled[:, np.newaxis]
+    # Register the observations of each batch instance
+    observation_batches, observation_instants, outcomes = [], [], []
+    by_batch = np.argsort(batch_codes, kind="stable")
+    for batch, batch_enabled in enumerate(np.split(enabled[by_batch], firsts[1:])):
+        batch_instance_start = batch_instance_starts[batch]
+        non_activating_instants = ready_instants[batch].tolist()
+        # 2 - Non-activating instants per enablement time of each case
+        enable_times = [instant for instant in batch_enabled.tolist() if instant < batch_instance_start]
         non_activating_instants += random.sample(enable_times, min(len(enable_times), num_batch_enabled_negative_events))
-        # 3 - Obtain the features per instant
-        for instant in non_activating_instants:
-            if instant < batch_instance_start:
-                # Discard the batch cases enabled after the current instant, and then calculate the features of the remaining cases.
-                features += [
-                    _get_features(
-                        event_log,
-                        instant,
-                        batch_instance[batch_instance[log_ids.enabled_time] <= instant],
-                        0,
-                        log_ids
-                    )
-                ]
-    # Transform duration to seconds
-    features_table = pd.DataFrame(data=features)
-    features_table['instant'] = features_table['instant'].astype(np.int64) / 10 ** 9
-    features_table['batch_ready_wt'] = features_table['batch_ready_wt'].apply(lambda t: t.total_seconds())
-    features_table['batch_max_wt'] = features_table['batch_max_wt'].apply(lambda t: t.total_seconds())
-    # features_table['max_cycle_time'] = features_table['max_cycle_time'].apply(lambda t: t.total_seconds())
+        # Instant activating the batch instance, followed by the non-activating ones
+        instants = [batch_instance_start] + [instant for instant in non_activating_instants if instant < batch_instance_start]
+        observation_batches += [batch] * len(instants)
+        observation_instants += instants
+        outcomes += [1] + [0] * (len(instants) - 1)
+    observation_batches = np.array(observation_batches, dtype=np.int64)
+    observation_instants = np.array(observation_instants, dtype=np.int64)
+    outcomes = np.array(outcomes, dtype=np.int64)
+    # Batch cases enabled at each instant: all of them when fired, the ones enabled before the instant otherwise
+    num_enabled = np.where(
+        outcomes == 1,
+        sizes[observation_batches],
+        _count_at_or_before(sorted_codes, sorted_enabled, observation_batches, observation_instants)
+    )
+    # (discarding the instants with no batch case enabled yet)
+    retained = num_enabled > 0
+    observations = Observations(
+        instants=_from_int64_ns(observation_instants[retained], batched_instances[log_ids.start_time].dt.tz),
+        batch_cases=batch_cases,
+        first=firsts[observation_batches[retained]],
+        last=firsts[observation_batches[retained]] + num_enabled[retained] - 1,
+        log_ids=log_ids,
+        context=context
+    )
+    # Compute the features of all the observations
+    features_table = pd.DataFrame({
+        log_ids.batch_id: batch_cases[log_ids.batch_id].iloc[observations.first].tolist(),
+        log_ids.batch_type: batch_cases[log_ids.batch_type].iloc[observations.first].tolist(),
+        log_ids.activity: batch_cases[log_ids.activity].iloc[observations.first].tolist(),
+        log_ids.resource: batch_cases[log_ids.resource].iloc[observations.first].tolist(),
+        'instant': observation_instants[retained] / 10 ** 9
+    })
+    for feature in features:
+        values = FEATURE_PROVIDERS[feature](observations)
+        # Transform durations to seconds
+        if pd.api.types.is_timedelta64_dtype(values):
+            values = pd.TimedeltaIndex(values).total_seconds()
+        features_table[feature] = np.asarray(values)
+    features_table['outcome'] = outcomes[retained]
     # Return table
     return features_table
 
 
 def _get_features(
-        event_log: pd.DataFrame,
         instant: pd.Timestamp,
         batch_instance: pd.DataFrame,
         outcome: int,
-        log_ids: EventLogIDs
+        log_ids: EventLogIDs,
+        features: Optional[list] = None,
+        context: Optional[FeaturesContext] = None
 ) -> dict:
     """
     Get the features to discover activation rules of a specific instant [instant] in a batch instance [batch_instance].
 
-    :param event_log:       event log with all the activity instances.
     :param instant:         instant of the event to register.
     :param batch_instance:  DataFrame with the activity instances of the batch instance.
     :param outcome:         integer indicating the outcome of this instant, 1 if the batch is fired, 0 if not.
     :param log_ids:         mapping with the IDs of each column in the dataset.
+    :param features:        names of the features to compute (see [FEATURE_PROVIDERS]), [DEFAULT_FEATURES] if None.
+    :param context:         indexes over the full event log, needed by some features (e.g., 'max_cycle_time').
 
     :return: a dict with the features of this batch instance.
     """
-    batch_id = batch_instance[log_ids.batch_id].iloc[0]
-    batch_type = batch_instance[log_ids.batch_type].iloc[0]
-    activity = batch_instance[log_ids.activity].iloc[0]
-    resource = batch_instance[log_ids.resource].iloc[0]
-    batch_size = len(batch_instance)
-    batch_ready_wt = instant - batch_instance[log_ids.enabled_time].max()
-    batch_max_wt = instant - batch_instance[log_ids.enabled_time].min()
-    case_ids = batch_instance[log_ids.case].unique()
-    # max_cycle_time = (instant - event_log[event_log[log_ids.case].isin(case_ids)][log_ids.start_time].min())
-    week_day = instant.day_of_week
-    # day_of_month = instant.day
-    daily_hour = instant.hour
-    # minute_of_day = instant.minute
-    # Return the features dict
+    features = DEFAULT_FEATURES if features is None else features
+    _check_features(features)
+    # Compute the features as a single observation with all the cases of the batch instance
+    batch_cases = batch_instance.iloc[np.argsort(_to_int64_ns(batch_instance[log_ids.enabled_time]), kind="stable")]
+    observations = Observations(
+        instants=pd.DatetimeIndex([instant]),
+        batch_cases=batch_cases,
+        first=np.array([0]),
+        last=np.array([len(batch_cases) - 1]),
+        log_ids=log_ids,
+        context=context
+    )
+    # Return the features dict (reading the values positionally, as the providers may return a Series with any index)
     return {
-        log_ids.batch_id: batch_id,
-        log_ids.batch_type: batch_type,
-        log_ids.activity: activity,
-        log_ids.resource: resource,
+        log_ids.batch_id: batch_instance[log_ids.batch_id].iloc[0],
+        log_ids.batch_type: batch_instance[log_ids.batch_type].iloc[0],
+        log_ids.activity: batch_instance[log_ids.activity].iloc[0],
+        log_ids.resource: batch_instance[log_ids.resource].iloc[0],
         'instant': instant,
-        'batch_size': batch_size,
-        'batch_ready_wt': batch_ready_wt,
-        'batch_max_wt': batch_max_wt,
-        # 'max_cycle_time': max_cycle_time,
-        'week_day': week_day,
-        # 'day_of_month': day_of_month,
-        'daily_hour': daily_hour,
-        # 'minute': minute_of_day,
+        **{feature: np.asarray(FEATURE_PROVIDERS[feature](observations))[0] for feature in features},
         'outcome': outcome
     }
+
+
+def _check_features(features: list):
+    unknown_features = [feature for feature in features if feature not in FEATURE_PROVIDERS]
+    if len(unknown_features) > 0:
+        raise ValueError("Unknown features {}, available features are {}.".format(unknown_features, list(FEATURE_PROVIDERS)))
+
+
+def _count_at_or_before(
+        codes: np.ndarray,
+        values: np.ndarray,
+        query_codes: np.ndarray,
+        query_values: np.ndarray,
+        side: str = "right"
+) -> np.ndarray:
+    """
+    For each query, count the number of elements with its same code and a value lower or equal than the query value (or only
+    lower than it if [side] is "left").
+
+    :param codes:           int array with the code (e.g., the group) of each element, sorted.
+    :param values:          array with the value of each element, sorted within the elements of the same code.
+    :param query_codes:     int array with the code of each query.
+    :param query_values:    array with the value of each query.
+    :param side:            "right" to count the values equal to the query value, "left" to not count them.
+
+    :return: an int64 array with the count of each query.
+    """
+    counts = np.zeros(len(query_codes), dtype=np.int64)
+    # Process the queries grouped by code, with a binary search over the (presorted) values of that code
+    query_order = np.argsort(query_codes, kind="stable")
+    unique_codes, query_bounds = np.unique(query_codes[query_order], return_index=True)
+    lower_bounds = np.searchsorted(codes, unique_codes, side="left")
+    upper_bounds = np.searchsorted(codes, unique_codes, side="right")
+    for lower, upper, positions in zip(lower_bounds, upper_bounds, np.split(query_order, query_bounds[1:])):
+        counts[positions] = np.searchsorted(values[lower:upper], query_values[positions], side=side)
+    return counts
+
+
+def _get_case_first_start(event_log: pd.DataFrame, log_ids: EventLogIDs) -> pd.Series:
+    """
+    Get the instant in which each case started, i.e., the start time of its first activity instance.
+
+    :param event_log:   event log with all the activity instances.
+    :param log_ids:     mapping with the IDs of each column in the dataset.
+
+    :return: a Series with the case IDs as index, and their first start time as values.
+    """
+    return event_log.groupby(log_ids.case)[log_ids.start_time].min()
+
+
+def _batch_size(observations: Observations) -> np.ndarray:
+    return observations.last - observations.first + 1
+
+
+def _batch_ready_wt(observations: Observations) -> pd.TimedeltaIndex:
+    return observations.instants - observations.at(observations.log_ids.enabled_time, observations.last)
+
+
+def _batch_max_wt(observations: Observations) -> pd.TimedeltaIndex:
+    return observations.instants - observations.at(observations.log_ids.enabled_time, observations.first)
+
+
+def _max_cycle_time(observations: Observations) -> pd.TimedeltaIndex:
+    if observations.context is None:
+        raise ValueError("The feature 'max_cycle_time' needs the full event log, pass a FeaturesContext to compute it.")
+    log_ids = observations.log_ids
+    # First start of the cases enabled so far in each batch instance (batch cases are sorted by enabled time)
+    case_first_start = _to_int64_ns(observations.context.case_first_start.reindex(observations.batch_cases[log_ids.case]))
+    batch_first_start = pd.Series(case_first_start).groupby(observations.batch_cases[log_ids.batch_id].to_numpy()).cummin()
+    return pd.to_timedelta(_to_int64_ns(observations.instants) - batch_first_start.to_numpy()[observations.last])
+
+
+def _queue_length(observations: Observations) -> np.ndarray:
+    if observations.context is None:
+        raise ValueError("The feature 'queue_length' needs the full event log, pass a FeaturesContext to compute it.")
+    log_ids = observations.log_ids
+    # Activity instances of the same activity and resource enabled at the instant, and not started before it
+    keys = pd.MultiIndex.from_arrays([
+        observations.at(log_ids.activity, observations.first), observations.at(log_ids.resource, observations.first)
+    ])
+    instants = _to_int64_ns(observations.instants)
+    times = observations.context.activity_resource_times
+    return times.count(log_ids.enabled_time, keys, instants, "right") - times.count(log_ids.start_time, keys, instants, "left")
+
+
+def _resource_workload(observations: Observations) -> np.ndarray:
+    if observations.context is None:
+        raise ValueError("The feature 'resource_workload' needs the full event log, pass a FeaturesContext to compute it.")
+    log_ids = observations.log_ids
+    # Activity instances of the resource (of any activity) started before the instant, and not ended at it
+    keys = pd.MultiIndex.from_arrays([observations.at(log_ids.resource, observations.first)])
+    instants = _to_int64_ns(observations.instants)
+    times = observations.context.resource_times
+    workload = times.count(log_ids.start_time, keys, instants, "left") - times.count(log_ids.end_time, keys, instants, "right")
+    # The ones starting and ending at the instant are discounted (ended at it) without having been counted (not started
+    # before it), add them back
+    zero_duration_times = observations.context.resource_zero_duration_times
+    return (
+            workload +
+            zero_duration_times.count(log_ids.start_time, keys, instants, "right") -
+            zero_duration_times.count(log_ids.start_time, keys, instants, "left")
+    )
+
+
+register_feature('batch_size', _batch_size)
+register_feature('batch_ready_wt', _batch_ready_wt)
+register_feature('batch_max_wt', _batch_max_wt)
+register_feature('week_day', lambda observations: observations.instants.day_of_week.to_numpy(dtype=np.int64))
+register_feature('day_of_month', lambda observations: observations.instants.day.to_numpy(dtype=np.int64))
+register_feature('daily_hour', lambda observations: observations.instants.hour.to_numpy(dtype=np.int64))
+register_feature('minute', lambda observations: observations.instants.minute.to_numpy(dtype=np.int64))
+register_feature('max_cycle_time', _max_cycle_time)
+register_feature('queue_length', _queue_length)
+register_feature('resource_workload', _resource_workload)
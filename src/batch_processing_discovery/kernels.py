@@ -0,0 +1,113 @@
+from functools import lru_cache
+from importlib.util import find_spec
+from typing import Callable, Optional
+
+import numpy as np
+import pandas as pd
+
+# Numba is only imported (and the kernels compiled) the first time a compiled kernel is needed, as importing it is slow,
+# falling back to the uncompiled kernels if it cannot be imported
+NUMBA_AVAILABLE = find_spec("numba") is not None
+# Minimum number of activity instances to import Numba to process them: below it, running the kernels as plain Python takes
+# less time than importing Numba and loading the compiled kernels (~0.5 s)
+NUMBA_MIN_EVENTS = 1_000_000
+
+
+def _sweep_line_batches_loop(enabled, starts, ends, max_sequential_gap, batch_min_size):
+    """
+    Sweep line over the activity instances of one (resource, activity) group, assigning each of them to the batch instance
+    candidate it belongs to, and discarding the candidates with less than [batch_min_size] instances. Compiled with Numba
+    when available (see [_get_numba_sweep_line]), and run as plain Python over lists otherwise (see [_sweep_line_batches_python]).
+
+    :param enabled:             enabled times (in ns) of the activity instances, sorted by start time.
+    :param starts:              start times (in ns) of the activity instances, sorted by start time.
+    :param ends:                end times (in ns) of the activity instances, sorted by start time.
+    :param max_sequential_gap:  maximum time gap (in ns) between the processing of an activity instance and the next one.
+    :param batch_min_size:      minimum number of activity instances for a batch to be considered as such.
+
+    :return: an int64 array with, for each activity instance, the (group-local) number of its batch instance, or -1 if it is
+             not part of any batch instance.
+    """
+    num_events = len(starts)
+    labels = np.full(num_events, -1, dtype=np.int64)
+    num_batches = 0
+    candidate_first = 0
+    batch_instance_start, batch_instance_end = 0, 0
+    for i in range(num_events):
+        if i > candidate_first and enabled[i] <= batch_instance_start and (starts[i] - batch_instance_end) <= max_sequential_gap:
+            # Add event to batch, updating its end if necessary
+            if ends[i] > batch_instance_end:
+                batch_instance_end = ends[i]
+        else:
+            # Event not in batch: create current one if it fulfill the constraints
+            if i > 0 and (i - candidate_first) >= batch_min_size:
+                labels[candidate_first:i] = num_batches
+                num_batches += 1
+            # Start another batch instance candidate with new event
+            candidate_first = i
+            batch_instance_start, batch_instance_end = starts[i], ends[i]
+    # Process last iteration
+    if num_events > 0 and (num_events - candidate_first) >= batch_min_size:
+        labels[candidate_first:] = num_batches
+    return labels
+
+
+def _sweep_line_batches_python(
+        enabled: np.ndarray,
+        starts: np.ndarray,
+        ends: np.ndarray,
+        max_sequential_gap: int,
+        batch_min_size: int
+) -> np.ndarray:
+    """
+    Run [_sweep_line_batches_loop] uncompiled, over Python ints (iterating over NumPy scalars is much slower).
+    """
+    return _sweep_line_batches_loop(enabled.tolist(), starts.tolist(), ends.tolist(), max_sequential_gap, batch_min_size)
+
+
+@lru_cache(maxsize=None)
+def _get_numba_sweep_line() -> Optional[Callable]:
+    """
+    Import Numba and compile the sweep line kernel (only the first time it is called).
+
+    :return: the compiled version of [_sweep_line_batches_loop], or None if Numba is not installed or cannot be imported
+             (e.g., it does not support the installed NumPy version).
+    """
+    if not NUMBA_AVAILABLE:
+        return None
+    try:
+        from numba import njit
+    except ImportError:
+        return None
+    return njit(cache=True)(_sweep_line_batches_loop)
+
+
+def _get_sweep_line_kernel(num_events: int) -> Callable:
+    """
+    Get the kernel to run the sweep line (see [_sweep_line_batches_loop]) over [num_events] activity instances with: compiled
+    with Numba if it is worth importing it (i.e., there are at least [NUMBA_MIN_EVENTS] activity instances, or it has been
+    already imported) and it can be imported, or as plain Python otherwise.
+    """
+    if num_events >= NUMBA_MIN_EVENTS or _get_numba_sweep_line.cache_info().currsize > 0:
+        numba_sweep_line = _get_numba_sweep_line()
+        if numba_sweep_line is not None:
+            return numba_sweep_line
+    return _sweep_line_batches_python
+
+
+def _to_int64_ns(timestamps) -> np.ndarray:
+    """
+    Transform a column of timestamps into an int64 array with the nanoseconds since epoch (UTC) of each of them.
+    """
+    if not pd.api.types.is_datetime64_any_dtype(timestamps):
+        # Not parsed yet (e.g., strings)
+        timestamps = pd.to_datetime(timestamps, utc=True)
+    return np.asarray(timestamps.values, dtype="datetime64[ns]").view(np.int64)
+
+
+def _from_int64_ns(values: np.ndarray, tz=None) -> pd.DatetimeIndex:
+    """
+    Transform an int64 array with nanoseconds since epoch (UTC) into timestamps in the time zone [tz] (naive if None).
+    """
+    timestamps = pd.DatetimeIndex(np.asarray(values, dtype=np.int64).view("datetime64[ns]"))
+    return timestamps.tz_localize("UTC").tz_convert(tz) if tz is not None else timestamps
@@ -0,0 +1,129 @@
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+from .config import EventLogIDs
+from .discovery import discover_batches
+from .preprocessing import normalize_timestamps
+
+
+def discover_batches_parallel(
+        event_log: pd.DataFrame,
+        log_ids: EventLogIDs,
+        batch_min_size: int = 2,
+        max_sequential_gap: pd.Timedelta = pd.Timedelta(0),
+        invalid_timestamps: str = "repair",
+        workers: int = 1
+) -> pd.DataFrame:
+    """
+    Parallel version of [discover_batches]. As the batches are discovered independently for each (resource, activity) pair,
+    the pairs are split into [workers] partitions of similar size, and each partition is processed in a separate process.
+    The batch IDs of each partition are then renumbered to get the same result as [discover_batches].
+
+    :param event_log:           the event log to analyze.
+    :param log_ids:             mapping with the IDs of each column in the dataset.
+    :param batch_min_size:      minimum number of activity instances for a batch to be considered as such.
+    :param max_sequential_gap:  maximum time gap (with no processing) between the processing of an activity
+                                instance and the next one to be considered as a batch.
+    :param invalid_timestamps:  how to handle the activity instances with invalid timestamps, see [normalize_timestamps].
+    :param workers:             number of processes to run the discovery in.
+    :return: a copy of [event_log], with its timestamps normalized and without the activity instances dropped due to
+             invalid timestamps (see [normalize_timestamps]), with two extra columns, one denoting the ID of the batch and
+             another one denoting the processing type.
+    """
+    if workers <= 1:
+        return discover_batches(event_log, log_ids, batch_min_size, max_sequential_gap, invalid_timestamps)
+    # Normalize the timestamps once, so each partition takes the fast path
+    normalized_event_log = normalize_timestamps(event_log, log_ids, invalid_timestamps)
+    partitions = _partition_event_log(normalized_event_log, log_ids, workers)
+    if len(partitions) == 0:
+        # No (resource, activity) pair to process (e.g., empty event log)
+        return _merge_partition_batches(normalized_event_log, log_ids, [], [])
+    # Discover the batches of each partition
+    with ProcessPoolExecutor(max_workers=min(workers, len(partitions))) as executor:
+        futures = [
+            executor.submit(
+                _discover_partition_batches,
+                normalized_event_log.iloc[positions],
+                log_ids,
+                batch_min_size,
+                max_sequential_gap
+            )
+            for positions in partitions
+        ]
+        partition_results = [future.result() for future in futures]
+    # Set the batch information
+    return _merge_partition_batches(normalized_event_log, log_ids, partitions, partition_results)
+
+
+def _partition_event_log(event_log: pd.DataFrame, log_ids: EventLogIDs, num_partitions: int) -> list:
+    """
+    Split the (resource, activity) pairs of [event_log] into (at most) [num_partitions] partitions with a similar number of
+    activity instances. The pairs are kept in the order [discover_batches] processes them (i.e., sorted), so each partition
+    contains a contiguous range of pairs, and the activity instances with no resource or activity are discarded.
+
+    :return: a list with the positions (in [event_log]) of the activity instances of each partition.
+    """
+    codes = event_log.groupby([log_ids.resource, log_ids.activity], sort=True).ngroup().to_numpy(dtype=float)
+    valid = np.flatnonzero(~np.isnan(codes))
+    codes = codes[valid].astype(np.int64)
+    if len(valid) == 0:
+        return []
+    # Positions of the activity instances sorted by pair, and number of instances per pair
+    positions = valid[np.argsort(codes, kind="stable")]
+    pair_sizes = np.bincount(codes)
+    # Split the pairs where the cumulative number of activity instances reaches each fraction of the total
+    cumulative_sizes = np.cumsum(pair_sizes)
+    bounds = np.searchsorted(cumulative_sizes, np.linspace(0, len(valid), num_partitions + 1)[1:-1], side="left")
+    row_bounds = np.unique(cumulative_sizes[bounds])
+    return [partition for partition in np.split(positions, row_bounds) if len(partition) > 0]
+
+
+def _discover_partition_batches(
+        event_log: pd.DataFrame,
+        log_ids: EventLogIDs,
+        batch_min_size: int,
+        max_sequential_gap: pd.Timedelta
+) -> tuple:
+    """
+    Discover the batches of a partition of the event log (with its timestamps already normalized).
+
+    :return: a tuple with the batch ID (-1 if not batched) and the batch type of each activity instance.
+    """
+    batched_event_log = discover_batches(event_log, log_ids, batch_min_size, max_sequential_gap, "ignore")
+    return (
+        batched_event_log[log_ids.batch_id].to_numpy(dtype=np.int64, na_value=-1),
+        batched_event_log[log_ids.batch_type].to_numpy(dtype=object)
+    )
+
+
+def _merge_partition_batches(
+        event_log: pd.DataFrame,
+        log_ids: EventLogIDs,
+        partitions: list,
+        partition_results: list
+) -> pd.DataFrame:
+    """
+    Set the batch information discovered for each partition of [event_log], renumbering the batch IDs of each partition
+    following the order of the partitions.
+
+    :param event_log:           event log (with the timestamps normalized) the partitions have been computed from.
+    :param log_ids:             mapping with the IDs of each column in the dataset.
+    :param partitions:          list with the positions of the activity instances of each partition.
+    :param partition_results:   list with the result of [_discover_partition_batches] for each partition.
+
+    :return: a copy of [event_log] with the batch ID and batch type columns.
+    """
+    batch_ids = np.full(len(event_log), -1, dtype=np.int64)
+    batch_types = np.full(len(event_log), pd.NA, dtype=object)
+    offset = 0
+    for positions, (partition_batch_ids, partition_batch_types) in zip(partitions, partition_results):
+        batched = partition_batch_ids >= 0
+        batch_ids[positions[batched]] = partition_batch_ids[batched] + offset
+        batch_types[positions[batched]] = partition_batch_types[batched]
+        offset += partition_batch_ids.max() + 1 if batched.any() else 0
+    batched_event_log = event_log.copy()
+    batched_event_log[log_ids.batch_id] = pd.arrays.IntegerArray(batch_ids, batch_ids < 0)
+    batched_event_log[log_ids.batch_type] = batch_types
+    return batched_event_log
@@ -0,0 +1,125 @@
+import warnings
+
+import numpy as np
+import pandas as pd
+
+from .config import EventLogIDs
+from .kernels import _from_int64_ns, _to_int64_ns
+
+INVALID_ROWS_POLICIES = ["repair", "drop", "raise", "ignore"]
+
+
+def normalize_timestamps(event_log: pd.DataFrame, log_ids: EventLogIDs, invalid_rows: str = "repair") -> pd.DataFrame:
+    """
+    Make sure the enabled, start, and end times of [event_log] share the same nanosecond precision timestamp type (i.e., an
+    int64 representation), and handle the activity instances with invalid timestamps: missing start or end time, end time
+    before the start time, or enabled time after the start time (or missing).
+
+    When the timestamps are already normalized and valid, [event_log] is returned as it is, without copying it. Otherwise,
+    the timestamps and the invalid activity instances are handled in a copy of it. The timestamps already parsed in the same
+    time zone (or all of them time zone naive) keep it, only their precision is changed; the rest of them are converted to
+    UTC (considering the time zone naive ones to be in UTC).
+
+    :param event_log:       event log to normalize.
+    :param log_ids:         mapping with the IDs of each column in the dataset.
+    :param invalid_rows:    how to handle the activity instances with invalid timestamps:
+                             - "repair": swap the start and end times when the end is before the start, set the enabled time
+                             to the start time when it is after it (or missing), and drop the activity instances with no
+                             start or end time.
+                             - "drop": drop all the activity instances with invalid timestamps.
+                             A warning with the number of repaired and dropped activity instances is issued in both cases.
+                             - "raise": raise a ValueError if there is any activity instance with invalid timestamps.
+                             - "ignore": keep them as they are.
+
+    :return: the event log with the timestamps normalized, which may have fewer activity instances than [event_log] if any
+             has been dropped.
+    """
+    if invalid_rows not in INVALID_ROWS_POLICIES:
+        raise ValueError("Unknown policy '{}' for invalid rows, available ones are {}.".format(invalid_rows, INVALID_ROWS_POLICIES))
+    columns = [log_ids.enabled_time, log_ids.start_time, log_ids.end_time]
+    normalized_event_log = event_log
+    # Convert the timestamps if they do not share a common representation
+    if not _have_common_timestamp_type(event_log, columns):
+        normalized_event_log = event_log.copy()
+        if _have_common_time_zone(event_log, columns):
+            # Keep their time zone (the features of the firing rules, e.g., the daily hour, depend on it)
+            for column in columns:
+                normalized_event_log[column] = normalized_event_log[column].dt.as_unit("ns")
+        else:
+            for column in columns:
+                normalized_event_log[column] = _to_utc_timestamps(normalized_event_log[column])
+    if invalid_rows == "ignore":
+        return normalized_event_log
+    # Detect invalid activity instances
+    enabled, start, end = [_to_int64_ns(normalized_event_log[column]) for column in columns]
+    missing_start_end = (start == np.iinfo(np.int64).min) | (end == np.iinfo(np.int64).min)
+    end_before_start = ~missing_start_end & (end < start)
+    invalid_enabled = ~missing_start_end & ((enabled > np.minimum(start, end)) | (enabled == np.iinfo(np.int64).min))
+    invalid = missing_start_end | end_before_start | invalid_enabled
+    if not invalid.any():
+        return normalized_event_log
+    # Handle them
+    if invalid_rows == "raise":
+        raise ValueError(
+            "{} activity instances with invalid timestamps: {} with no start or end time, {} ending before they start, and {} "
+            "enabled after they start (or not enabled).".format(
+                invalid.sum(), missing_start_end.sum(), end_before_start.sum(), invalid_enabled.sum()
+            )
+        )
+    if normalized_event_log is event_log:
+        normalized_event_log = event_log.copy()
+    if invalid_rows == "repair":
+        new_start, new_end = np.minimum(start, end), np.maximum(start, end)
+        tz = normalized_event_log[log_ids.start_time].dt.tz
+        normalized_event_log[log_ids.start_time] = _from_int64_ns(new_start, tz)
+        normalized_event_log[log_ids.end_time] = _from_int64_ns(new_end, tz)
+        normalized_event_log[log_ids.enabled_time] = _from_int64_ns(np.where(invalid_enabled, new_start, enabled), tz)
+        normalized_event_log = normalized_event_log[~missing_start_end]
+        warnings.warn(
+            "{} activity instances with invalid timestamps: {} repaired ({} ending before they start, {} enabled after they "
+            "start or not enabled), and {} dropped (no start or end time).".format(
+                invalid.sum(), (invalid & ~missing_start_end).sum(), end_before_start.sum(), invalid_enabled.sum(),
+                missing_start_end.sum()
+            )
+        )
+    else:
+        normalized_event_log = normalized_event_log[~invalid]
+        warnings.warn("{} activity instances with invalid timestamps dropped.".format(invalid.sum()))
+    return normalized_event_log
+
+
+def _have_common_timestamp_type(event_log: pd.DataFrame, columns: list) -> bool:
+    """
+    Check if all the [columns] of [event_log] are timestamps with nanosecond precision and the same time zone (or all of them
+    time zone naive).
+    """
+    return _have_common_time_zone(event_log, columns) and all(event_log[column].dt.unit == "ns" for column in columns)
+
+
+def _have_common_time_zone(event_log: pd.DataFrame, columns: list) -> bool:
+    """
+    Check if all the [columns] of [event_log] are timestamps with the same time zone (or all of them time zone naive).
+    """
+    return (
+            all(pd.api.types.is_datetime64_any_dtype(event_log[column]) for column in columns) and
+            len({str(event_log[column].dt.tz) for column in columns}) == 1
+    )
+
+
+def _to_utc_timestamps(timestamps: pd.Series) -> pd.Series:
+    """
+    Transform a column with timestamps (either parsed or not, time zone aware or not) into UTC timestamps with nanosecond
+    precision. The time zone naive timestamps are considered to be in UTC.
+    """
+    if pd.api.types.is_datetime64_any_dtype(timestamps):
+        if timestamps.dt.tz is None:
+            timestamps = timestamps.dt.tz_localize("UTC")
+        else:
+            timestamps = timestamps.dt.tz_convert("UTC")
+    else:
+        try:
+            timestamps = pd.to_datetime(timestamps, utc=True)
+        except ValueError:
+            # Not all of them follow the same format
+            timestamps = pd.to_datetime(timestamps, utc=True, format="mixed")
+    return timestamps.dt.as_unit("ns")
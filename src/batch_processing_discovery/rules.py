@@ -1,5 +1,4 @@
 import pandas as pd
-import wittgenstein as lw
 
 
 def _get_rules(
@@ -20,6 +19,9 @@ def _get_rules(
     :param max_rules:           Maximum number of activation rules to extract from a batch.
     :return: a dict with the RIPPER model, its confidence, and its support.
     """
+    # Imported here as it is slow to import, and only needed to discover the rules
+    import wittgenstein as lw
+
     # Create empty model and data copy
     ripper_model = None
     filtered_data = data.copy()
@@ -0,0 +1,212 @@
+import warnings
+from math import ceil
+from typing import Optional
+
+import numpy as np
+import pandas as pd
+
+from .batch_characteristics import discover_batch_characteristics
+from .config import EventLogIDs
+from .discovery import discover_batches
+from .kernels import _to_int64_ns
+from .preprocessing import normalize_timestamps
+
+
+def approximate_batch_processing_and_characteristics(
+        event_log: pd.DataFrame,
+        log_ids: EventLogIDs,
+        sample_fraction: float = 0.1,
+        batch_min_size: int = 2,
+        max_sequential_gap: pd.Timedelta = pd.Timedelta(0),
+        resource_aware: bool = False,
+        features: Optional[list] = None,
+        invalid_timestamps: str = "repair",
+        confidence: float = 0.95,
+        num_bootstrap: int = 1000,
+        seed: Optional[int] = None
+) -> list:
+    """
+    Approximate version of [discover_batch_processing_and_characteristics] for exploring large event logs. As the batches are
+    discovered independently for each (resource, activity) pair, only a sample of the resources of each activity is analyzed,
+    and the batch frequency and the size and duration distributions of each activity are extrapolated from them. The firing
+    rules, the batch type, and the duration statistics are the ones of the sample.
+
+    Each characteristic has two extra keys:
+        - 'confidence_intervals': the [confidence] intervals of the batch frequency, the number of activity instances per batch
+        size, and the duration scale factor per batch size, estimated with a bootstrap over the sampled resources. When all the
+        resources of an activity are sampled (or [resource_aware] is True), the values are exact and so are their intervals.
+        When only one of them is sampled, the intervals cannot be estimated and are None.
+        - 'sample': the number of resources and activity instances analyzed, out of the total.
+
+    :param event_log:           event log to discover the batches and their characteristics.
+    :param log_ids:             mapping with the IDs of each column in the dataset.
+    :param sample_fraction:     fraction of the resources of each activity to analyze (at least one per activity).
+    :param batch_min_size:      (for discovery) minimum number of activity instances for a batch to be considered as such.
+    :param max_sequential_gap:  (for discovery) maximum time gap (with no processing) between the processing of an activity
+                                instance and the next one to be considered as a batch.
+    :param resource_aware:      (for characteristics extraction) if True, take into the account both the resource and the
+                                executed activity for the characteristics discovery.
+    :param features:            (for characteristics extraction) names of the features to discover the firing rules with.
+    :param invalid_timestamps:  (for discovery) how to handle the activity instances with invalid timestamps ("repair",
+                                "drop", "raise", or "ignore"), see [preprocessing.normalize_timestamps].
+    :param confidence:          confidence level of the reported intervals.
+    :param num_bootstrap:       number of bootstrap resamples to estimate the confidence intervals.
+    :param seed:                seed for the sampling of resources and the bootstrap.
+    :return: a list with the (approximate) characteristics of each discovered batch.
+    """
+    rng = np.random.default_rng(seed)
+    # Normalize the timestamps before sampling, so the sample and the full event log have the same activity instances
+    event_log = normalize_timestamps(event_log, log_ids, invalid_timestamps)
+    # Sample the (activity, resource) pairs to analyze
+    pair_codes, pairs = pd.factorize(pd.MultiIndex.from_frame(event_log[[log_ids.activity, log_ids.resource]]))
+    sampled_pairs = _sample_pairs(pairs, sample_fraction, rng)
+    sampled_rows = (pair_codes >= 0) & sampled_pairs[pair_codes]
+    sampled_event_log = event_log[sampled_rows]
+    # Discover the batches and their characteristics in the sample
+    batched_event_log = discover_batches(
+        event_log=sampled_event_log,
+        log_ids=log_ids,
+        batch_min_size=batch_min_size,
+        max_sequential_gap=max_sequential_gap,
+        invalid_timestamps="ignore"
+    )
+    batch_characteristics = discover_batch_characteristics(
+        event_log=batched_event_log,
+        log_ids=log_ids,
+        resource_aware=resource_aware,
+        features=features
+    )
+    # Number of activity instances and sum of durations per sampled pair and batch size
+    counts, durations = _get_pair_summaries(batched_event_log, pair_codes[sampled_rows], len(pairs), log_ids)
+    pair_sizes = np.bincount(pair_codes[pair_codes >= 0], minlength=len(pairs))
+    # Extrapolate the characteristics of each batch
+    pairs_activity = pairs.get_level_values(0)
+    pairs_resource = pairs.get_level_values(1)
+    for batch in batch_characteristics:
+        if resource_aware:
+            in_group = (pairs_activity == batch['activity']) & pairs_resource.isin(batch['resources'])
+        else:
+            in_group = pairs_activity == batch['activity']
+        group_pairs = np.flatnonzero(in_group & sampled_pairs)
+        exact = in_group.sum() == len(group_pairs)
+        batch.update(_extrapolate(
+            counts[group_pairs],
+            durations[group_pairs],
+            pair_sizes[in_group].sum(),
+            exact,
+            rng.multinomial(len(group_pairs), [1 / len(group_pairs)] * len(group_pairs), size=num_bootstrap),
+            confidence
+        ))
+        batch['sample'] = {
+            'resources': len(group_pairs),
+            'total_resources': int(in_group.sum()),
+            'activity_instances': int(pair_sizes[group_pairs].sum()),
+            'total_activity_instances': int(pair_sizes[in_group].sum())
+        }
+    # Return characteristics
+    return batch_characteristics
+
+
+def _sample_pairs(pairs: pd.MultiIndex, sample_fraction: float, rng: np.random.Generator) -> np.ndarray:
+    """
+    Sample, for each activity, a fraction of its (activity, resource) pairs (at least one).
+
+    :return: a boolean array denoting, for each pair, if it has been sampled.
+    """
+    sampled = np.zeros(len(pairs), dtype=bool)
+    for positions in pd.Series(np.arange(len(pairs))).groupby(np.asarray(pairs.get_level_values(0))).indices.values():
+        num_sampled = min(len(positions), max(1, ceil(sample_fraction * len(positions))))
+        sampled[rng.choice(positions, num_sampled, replace=False)] = True
+    return sampled
+
+
+def _get_pair_summaries(batched_event_log: pd.DataFrame, pair_codes: np.ndarray, num_pairs: int, log_ids: EventLogIDs) -> tuple:
+    """
+    Get, for each (activity, resource) pair, the number of activity instances and the sum of their durations (in seconds) for
+    each batch size (column 0 for the non batched activity instances).
+
+    :return: a tuple with two (pairs x sizes) arrays, the counts and the sums of durations.
+    """
+    batch_ids = batched_event_log[log_ids.batch_id]
+    batched = ~pd.isna(batch_ids).to_numpy()
+    sizes = np.zeros(len(batched_event_log), dtype=np.int64)
+    sizes[batched] = batch_ids[batched].groupby(batch_ids[batched].to_numpy()).transform('size').to_numpy()
+    durations = (_to_int64_ns(batched_event_log[log_ids.end_time]) - _to_int64_ns(batched_event_log[log_ids.start_time])) / 10 ** 9
+    num_sizes = sizes.max() + 1 if len(sizes) > 0 else 1
+    counts = np.zeros((num_pairs, num_sizes))
+    sums = np.zeros((num_pairs, num_sizes))
+    np.add.at(counts, (pair_codes, sizes), 1)
+    np.add.at(sums, (pair_codes, sizes), durations)
+    return counts, sums
+
+
+def _extrapolate(
+        counts: np.ndarray,
+        durations: np.ndarray,
+        total_instances: int,
+        exact: bool,
+        bootstrap_weights: np.ndarray,
+        confidence: float
+) -> dict:
+    """
+    Estimate the batch frequency, the number of activity instances per batch size, and the duration scale factor per batch size
+    of a group of activity instances from the summaries of its sampled pairs, with their confidence intervals.
+
+    :param counts:              (pairs x sizes) array with the number of activity instances per sampled pair and batch size.
+    :param durations:           (pairs x sizes) array with the sum of durations per sampled pair and batch size.
+    :param total_instances:     number of activity instances of the group in the full event log.
+    :param exact:               True if all the pairs of the group have been sampled, so the values are exact.
+    :param bootstrap_weights:   (resamples x pairs) array with the number of times each pair is in each bootstrap resample.
+    :param confidence:          confidence level of the intervals.
+
+    :return: a dict with the estimated 'batch_frequency', 'size_distribution', 'duration_distribution', and their
+             'confidence_intervals'.
+    """
+    def estimate(weights: np.ndarray) -> tuple:
+        weighted_counts = weights @ counts
+        weighted_durations = weights @ durations
+        with np.errstate(divide='ignore', invalid='ignore'):
+            num_instances = weighted_counts.sum(axis=-1)
+            batch_frequency = (num_instances - weighted_counts[..., 0]) / num_instances
+            mean_durations = weighted_durations / weighted_counts
+            scale_factors = mean_durations / mean_durations[..., :1]
+        return batch_frequency, weighted_counts / num_instances[..., np.newaxis] * total_instances, scale_factors
+
+    batch_frequency, size_counts, scale_factors = estimate(np.ones(len(counts)))
+    observed_sizes = [size for size in range(1, counts.shape[1]) if counts[:, size].sum() > 0]
+    if counts[:, 0].sum() == 0:
+        # No non batched executions to learn the duration scale factor, 1.0 as default
+        scale_factors[:] = 1.0
+    estimates = {
+        'batch_frequency': float(batch_frequency),
+        'size_distribution': {**{size: int(round(size_counts[size])) for size in observed_sizes}, 1: int(round(size_counts[0]))},
+        'duration_distribution': {size: float(scale_factors[size]) for size in observed_sizes}
+    }
+    # Confidence intervals
+    if exact:
+        intervals = {
+            'batch_frequency': [estimates['batch_frequency']] * 2,
+            'size_distribution': {size: [float(count)] * 2 for size, count in estimates['size_distribution'].items()},
+            'duration_distribution': {size: [factor] * 2 for size, factor in estimates['duration_distribution'].items()}
+        }
+    elif len(counts) < 2:
+        intervals = None
+    else:
+        bootstrap_frequency, bootstrap_counts, bootstrap_factors = estimate(bootstrap_weights)
+        if counts[:, 0].sum() == 0:
+            bootstrap_factors[:] = 1.0
+        percentiles = [50 * (1 - confidence), 50 * (1 + confidence)]
+        with warnings.catch_warnings():
+            # Resamples with no instances of a batch size are ignored
+            warnings.simplefilter("ignore", category=RuntimeWarning)
+            frequency_interval = np.nanpercentile(bootstrap_frequency, percentiles)
+            counts_intervals = np.nanpercentile(bootstrap_counts[:, [0] + observed_sizes], percentiles, axis=0)
+            factors_intervals = np.nanpercentile(bootstrap_factors[:, observed_sizes], percentiles, axis=0)
+        intervals = {
+            'batch_frequency': frequency_interval.tolist(),
+            'size_distribution': {
+                size: counts_intervals[:, i].tolist() for i, size in enumerate([1] + observed_sizes)
+            },
+            'duration_distribution': {size: factors_intervals[:, i].tolist() for i, size in enumerate(observed_sizes)}
+        }
+    return {**estimates, 'confidence_intervals': intervals}
@@ -0,0 +1,203 @@
+import argparse
+import io
+import os
+import threading
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Iterator, Optional
+
+import pandas as pd
+
+from .config import DEFAULT_CSV_IDS, EventLogIDs
+from .parallel import _discover_partition_batches, _merge_partition_batches, _partition_event_log
+from .preprocessing import normalize_timestamps
+
+
+class BatchDiscoveryService:
+    """
+    Long-lived runner to discover the batches of many event logs, keeping a pool of worker processes alive (and with the
+    package already imported) between calls. The (resource, activity) pairs of each event log are split into partitions,
+    and the partitions of all the submitted event logs are scheduled in the pool largest-first, so the workers are kept busy
+    until the end. The event logs are returned as soon as all their partitions are processed.
+
+    Usage:
+        with BatchDiscoveryService(workers=8) as service:
+            for name, batched_event_log in service.discover_many({"log_a": event_log_a, "log_b": event_log_b}):
+                ...
+    """
+
+    def __init__(
+            self,
+            workers: Optional[int] = None,
+            log_ids: EventLogIDs = DEFAULT_CSV_IDS,
+            batch_min_size: int = 2,
+            max_sequential_gap: pd.Timedelta = pd.Timedelta(0),
+            invalid_timestamps: str = "repair",
+            partitions_per_log: Optional[int] = None
+    ):
+        """
+        :param workers:             number of worker processes (by default, the number of CPUs).
+        :param log_ids:             mapping with the IDs of each column in the datasets.
+        :param batch_min_size:      minimum number of activity instances for a batch to be considered as such.
+        :param max_sequential_gap:  maximum time gap (with no processing) between the processing of an activity
+                                    instance and the next one to be considered as a batch.
+        :param invalid_timestamps:  how to handle the activity instances with invalid timestamps, see [normalize_timestamps].
+        :param partitions_per_log:  maximum number of partitions to split each event log into (by default, [workers]).
+        """
+        self.workers = workers or os.cpu_count() or 1
+        self.log_ids = log_ids
+        self.batch_min_size = batch_min_size
+        self.max_sequential_gap = max_sequential_gap
+        self.invalid_timestamps = invalid_timestamps
+        self.partitions_per_log = partitions_per_log or self.workers
+        # Warm up each worker process when it starts (whenever the pool creates it), so no partition pays the import costs
+        self._executor = ProcessPoolExecutor(max_workers=self.workers, initializer=_warm_up)
+        try:
+            # Start the workers now, raising if any of them failed to warm up (the pool is broken in that case)
+            for future in [self._executor.submit(_ready) for _ in range(self.workers)]:
+                future.result()
+        except BaseException:
+            self._executor.shutdown(cancel_futures=True)
+            raise
+
+    def discover(self, event_log: pd.DataFrame) -> pd.DataFrame:
+        """
+        Discover the batches of one event log (see [discover_batches]).
+
+        :param event_log:   the event log to analyze.
+        :return: a copy of [event_log] with the batch ID and batch type columns.
+        """
+        return next(self.discover_many({None: event_log}))[1]
+
+    def discover_many(self, event_logs: dict) -> Iterator[tuple]:
+        """
+        Discover the batches of many event logs, returning each of them as soon as it is processed.
+
+        :param event_logs:  dict with the event logs to analyze, indexed by a name (or any hashable ID).
+        :return: an iterator of (name, batched event log) tuples, in the order the event logs are processed.
+        """
+        # Normalize the event logs and split them into partitions
+        normalized_event_logs, partitions, results, tasks = {}, {}, {}, []
+        for name, event_log in event_logs.items():
+            normalized_event_logs[name] = normalize_timestamps(event_log, self.log_ids, self.invalid_timestamps)
+            partitions[name] = _partition_event_log(normalized_event_logs[name], self.log_ids, self.partitions_per_log)
+            results[name] = [None] * len(partitions[name])
+            tasks += [(len(positions), name, index) for index, positions in enumerate(partitions[name])]
+        # Schedule the partitions largest-first
+        futures = {}
+        for _, name, index in sorted(tasks, key=lambda task: task[0], reverse=True):
+            future = self._executor.submit(
+                _discover_partition_batches,
+                normalized_event_logs[name].iloc[partitions[name][index]],
+                self.log_ids,
+                self.batch_min_size,
+                self.max_sequential_gap
+            )
+            futures[future] = (name, index)
+        # Event logs with no (resource, activity) pairs to process
+        for name in event_logs:
+            if len(partitions[name]) == 0:
+                yield name, _merge_partition_batches(normalized_event_logs[name], self.log_ids, [], [])
+        # Return each event log when all its partitions are processed
+        pending_partitions = {name: len(partitions[name]) for name in event_logs}
+        not_done = set(futures)
+        while len(not_done) > 0:
+            done, not_done = wait(not_done, return_when=FIRST_COMPLETED)
+            for future in done:
+                name, index = futures.pop(future)
+                results[name][index] = future.result()
+                pending_partitions[name] -= 1
+                if pending_partitions[name] == 0:
+                    yield name, _merge_partition_batches(
+                        normalized_event_logs[name], self.log_ids, partitions[name], results.pop(name)
+                    )
+
+    def close(self):
+        """
+        Shut down the pool of worker processes.
+        """
+        self._executor.shutdown()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+
+def serve(service: BatchDiscoveryService, host: str = "127.0.0.1", port: int = 8000) -> ThreadingHTTPServer:
+    """
+    Local HTTP stand-in for the service: each POST request with an event log in CSV as body is answered with the CSV of the
+    event log with the discovered batches. The requests are handled concurrently, sharing the pool of [service].
+
+    :param service: service to discover the batches with.
+    :param host:    host to listen in.
+    :param port:    port to listen in (0 to pick a free one).
+    :return: the HTTP server, already listening in a background thread (call [shutdown] to stop it, and [server_close] to
+             close its socket).
+    """
+
+    class _Handler(BaseHTTPRequestHandler):
+        def do_POST(self):
+            try:
+                event_log = pd.read_csv(io.BytesIO(self.rfile.read(int(self.headers.get("Content-Length", 0)))))
+                content = service.discover(event_log).to_csv(index=False).encode()
+                self.send_response(200)
+                self.send_header("Content-Type", "text/csv")
+            except Exception as error:  # Reported to the client, the server keeps running
+                content = str(error).encode()
+                self.send_response(400)
+                self.send_header("Content-Type", "text/plain")
+            self.send_header("Content-Length", str(len(content)))
+            self.end_headers()
+            self.wfile.write(content)
+
+    server = ThreadingHTTPServer((host, port), _Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def _ready():
+    # Nothing to do, the worker process is warmed up by the initializer of the pool before running any task
+    return True
+
+
+def _warm_up():
+    # Import the discovery and Numba in the worker process (once imported, the compiled kernels are used for any event log)
+    from .discovery import discover_batches
+    from .kernels import _get_numba_sweep_line
+
+    _get_numba_sweep_line()
+    discover_batches(
+        pd.DataFrame({
+            DEFAULT_CSV_IDS.case: [0, 1],
+            DEFAULT_CSV_IDS.activity: ["A", "A"],
+            DEFAULT_CSV_IDS.resource: ["R", "R"],
+            DEFAULT_CSV_IDS.enabled_time: pd.to_datetime(["2021-01-01T00:00:00"] * 2, utc=True),
+            DEFAULT_CSV_IDS.start_time: pd.to_datetime(["2021-01-01T01:00:00", "2021-01-01T02:00:00"], utc=True),
+            DEFAULT_CSV_IDS.end_time: pd.to_datetime(["2021-01-01T02:00:00", "2021-01-01T03:00:00"], utc=True),
+        }),
+        DEFAULT_CSV_IDS
+    )
+
+
+def main(argv: Optional[list] = None):
+    parser = argparse.ArgumentParser(description="Local HTTP service to discover the batches of event logs in CSV.")
+    parser.add_argument("--host", default="127.0.0.1", help="host to listen in (default: 127.0.0.1).")
+    parser.add_argument("--port", type=int, default=8000, help="port to listen in (default: 8000).")
+    parser.add_argument("-w", "--workers", type=int, help="number of worker processes (default: number of CPUs).")
+    args = parser.parse_args(argv)
+    with BatchDiscoveryService(workers=args.workers) as service:
+        server = serve(service, args.host, args.port)
+        print("Listening in http://{}:{}".format(*server.server_address))
+        try:
+            threading.Event().wait()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            server.shutdown()
+            server.server_close()
+
+
+if __name__ == "__main__":
+    main()
@@ -1,8 +1,13 @@
+import json
+
+import numpy as np
 import pandas as pd
 
 from batch_processing_discovery.batch_characteristics import _get_size_distribution, discover_batch_characteristics, \
-    _get_duration_distribution, discover_batch_processing_and_characteristics
+    _get_duration_distribution, discover_batch_processing_and_characteristics, _get_batched_groups, \
+    _get_batch_statistics, get_simulation_parameters, _fit_distributions
 from batch_processing_discovery.config import DEFAULT_CSV_IDS
+from batch_processing_discovery.features_table import FEATURE_COLUMNS, FEATURE_PROVIDERS, register_feature
 
 
 def test_discover_batch_processing_and_characteristics():
@@ -63,6 +68,53 @@ def test_discover_batch_characteristics():
     }
 
 
+def test_discover_batch_characteristics_feature_columns():
+    # Read input event log
+    event_log = pd.read_csv("./tests/assets/event_log_5.csv")
+    event_log[DEFAULT_CSV_IDS.enabled_time] = pd.to_datetime(event_log[DEFAULT_CSV_IDS.enabled_time], utc=True)
+    event_log[DEFAULT_CSV_IDS.start_time] = pd.to_datetime(event_log[DEFAULT_CSV_IDS.start_time], utc=True)
+    event_log[DEFAULT_CSV_IDS.end_time] = pd.to_datetime(event_log[DEFAULT_CSV_IDS.end_time], utc=True)
+    event_log[DEFAULT_CSV_IDS.batch_id] = event_log[DEFAULT_CSV_IDS.batch_id].astype('Int64')
+    # Case attribute read by a registered feature
+    event_log['priority'] = event_log[DEFAULT_CSV_IDS.case] % 2
+    register_feature(
+        'last_case_priority', lambda observations: observations.at('priority', observations.last), columns=['priority']
+    )
+    try:
+        rules = discover_batch_characteristics(event_log, DEFAULT_CSV_IDS, features=['batch_size', 'last_case_priority'])
+    finally:
+        del FEATURE_PROVIDERS['last_case_priority']
+        del FEATURE_COLUMNS['last_case_priority']
+    assert len(rules) == 1
+    assert rules[0]['activity'] == 'B'
+
+
+def test__get_batched_groups():
+    # Read input event log
+    event_log = pd.read_csv("./tests/assets/event_log_3.csv")
+    event_log[DEFAULT_CSV_IDS.batch_id] = event_log[DEFAULT_CSV_IDS.batch_id].astype('Int64')
+    # Add a never batched activity
+    non_batched = event_log.copy()
+    non_batched[DEFAULT_CSV_IDS.activity] = "Z"
+    non_batched[DEFAULT_CSV_IDS.batch_id] = pd.NA
+    event_log = pd.concat([event_log, non_batched], ignore_index=True)
+    # Only the groups of activity A are retrieved
+    groups = list(_get_batched_groups(event_log, DEFAULT_CSV_IDS, [DEFAULT_CSV_IDS.activity]))
+    assert len(groups) == 1
+    grouped_instances, batched_grouped_instances = groups[0]
+    assert (grouped_instances[DEFAULT_CSV_IDS.activity] == "A").all()
+    assert len(grouped_instances) == 23
+    assert len(batched_grouped_instances) == 16
+    assert not pd.isna(batched_grouped_instances[DEFAULT_CSV_IDS.batch_id]).any()
+    # Taking into account the resources, in the order of the keys
+    groups = list(_get_batched_groups(event_log, DEFAULT_CSV_IDS, [DEFAULT_CSV_IDS.activity, DEFAULT_CSV_IDS.resource]))
+    assert [list(grouped_instances[DEFAULT_CSV_IDS.resource].unique()) for grouped_instances, _ in groups] == [["Jonathan"], ["Joseph"]]
+    assert [(len(grouped_instances), len(batched)) for grouped_instances, batched in groups] == [(9, 6), (14, 10)]
+    # No batched activity instances
+    event_log[DEFAULT_CSV_IDS.batch_id] = pd.NA
+    assert list(_get_batched_groups(event_log, DEFAULT_CSV_IDS, [DEFAULT_CSV_IDS.activity])) == []
+
+
 def test__get_size_distribution():
     # Read input event log
     event_log = pd.read_csv("./tests/assets/event_log_3.csv")
@@ -97,3 +149,79 @@ def test__get_duration_distribution():
     filtered_event_log = event_log[(event_log[DEFAULT_CSV_IDS.activity] == "B") & (event_log[DEFAULT_CSV_IDS.resource] == "Jotaro")]
     duration_distribution = _get_duration_distribution(filtered_event_log, DEFAULT_CSV_IDS)
     assert duration_distribution == {3: 0.75}
+
+
+def test__get_batch_statistics():
+    # Read input event log
+    event_log = pd.read_csv("./tests/assets/event_log_6.csv")
+    event_log[DEFAULT_CSV_IDS.enabled_time] = pd.to_datetime(event_log[DEFAULT_CSV_IDS.enabled_time], utc=True)
+    event_log[DEFAULT_CSV_IDS.start_time] = pd.to_datetime(event_log[DEFAULT_CSV_IDS.start_time], utc=True)
+    event_log[DEFAULT_CSV_IDS.end_time] = pd.to_datetime(event_log[DEFAULT_CSV_IDS.end_time], utc=True)
+    event_log[DEFAULT_CSV_IDS.batch_id] = event_log[DEFAULT_CSV_IDS.batch_id].astype('Int64')
+    # Get statistics in one pass
+    filtered_event_log = event_log[(event_log[DEFAULT_CSV_IDS.activity] == "B") & (event_log[DEFAULT_CSV_IDS.resource] == "Jolyne")]
+    batch_statistics = _get_batch_statistics(filtered_event_log, DEFAULT_CSV_IDS)
+    assert batch_statistics['size_distribution'] == _get_size_distribution(filtered_event_log, DEFAULT_CSV_IDS)
+    assert batch_statistics['duration_distribution'] == {3: 0.5625}
+    duration_statistics = batch_statistics['duration_statistics']
+    assert list(sorted(duration_statistics.keys())) == [1, 3]
+    durations = filtered_event_log[DEFAULT_CSV_IDS.end_time] - filtered_event_log[DEFAULT_CSV_IDS.start_time]
+    batched_durations = durations[~pd.isna(filtered_event_log[DEFAULT_CSV_IDS.batch_id])].dt.total_seconds()
+    assert duration_statistics[3]['count'] == len(batched_durations)
+    assert duration_statistics[3]['mean'] == batched_durations.mean()
+    assert duration_statistics[3]['variance'] == batched_durations.var()
+    assert duration_statistics[3]['median'] == batched_durations.median()
+    assert duration_statistics[3]['min'] <= duration_statistics[3]['q25'] <= duration_statistics[3]['q75'] <= duration_statistics[3]['max']
+    assert duration_statistics[3]['distribution']['name'] in {'fix', 'norm', 'expon', 'lognorm', 'gamma', 'uniform'}
+
+
+def test__fit_distributions():
+    rng = np.random.default_rng(42)
+    samples = {
+        'norm': rng.normal(3600, 600, 1000),
+        'expon': rng.exponential(3600, 1000),
+        'lognorm': rng.lognormal(8, 0.5, 1000),
+        'gamma': rng.gamma(2, 1800, 1000),
+        'uniform': rng.uniform(600, 3600, 1000),
+        'two values': np.array([600.0, 1200.0]),
+        'three values': np.array([600.0, 900.0, 1500.0]),
+    }
+    statistics = pd.DataFrame([
+        {
+            'count': len(durations),
+            'mean': durations.mean(),
+            'var': durations.var(ddof=1),
+            'min': durations.min(),
+            'max': durations.max(),
+            'log_mean': np.log(durations).mean(),
+            'log_var': np.log(durations).var(),
+        }
+        for durations in samples.values()
+    ])
+    distributions = _fit_distributions(statistics)
+    # Samples drawn from a known distribution get that family back
+    assert [distribution['name'] for distribution in distributions[:5]] == ['norm', 'expon', 'lognorm', 'gamma', 'uniform']
+    assert distributions[4]['params'] == {'min': samples['uniform'].min(), 'max': samples['uniform'].max()}
+    # The uniform does not overfit small samples
+    assert distributions[5]['name'] != 'uniform'
+    assert distributions[6]['name'] != 'uniform'
+
+
+def test_get_simulation_parameters():
+    # Read input event log
+    event_log = pd.read_csv("./tests/assets/event_log_5.csv")
+    event_log[DEFAULT_CSV_IDS.enabled_time] = pd.to_datetime(event_log[DEFAULT_CSV_IDS.enabled_time], utc=True)
+    event_log[DEFAULT_CSV_IDS.start_time] = pd.to_datetime(event_log[DEFAULT_CSV_IDS.start_time], utc=True)
+    event_log[DEFAULT_CSV_IDS.end_time] = pd.to_datetime(event_log[DEFAULT_CSV_IDS.end_time], utc=True)
+    event_log[DEFAULT_CSV_IDS.batch_id] = event_log[DEFAULT_CSV_IDS.batch_id].astype('Int64')
+    # Get the simulation parameters of the discovered characteristics
+    simulation_parameters = get_simulation_parameters(discover_batch_characteristics(event_log, DEFAULT_CSV_IDS))
+    assert len(simulation_parameters) == 1
+    parameters = simulation_parameters[0]
+    assert parameters['activity'] == 'B'
+    assert parameters['size_probabilities'] == {1: 2 / 50, 3: 48 / 50}
+    assert parameters['duration_scale_factors'] == {3: 0.5}
+    assert list(parameters['duration_distributions'].keys()) == [1, 3]
+    assert parameters['firing_rules'] == [[{'attribute': "batch_size", 'comparison': "=", 'value': "3"}]]
+    # Serializable
+    json.dumps(simulation_parameters)
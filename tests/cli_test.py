@@ -0,0 +1,50 @@
+import json
+
+import pandas as pd
+import pytest
+
+from batch_processing_discovery.batch_characteristics import discover_batch_processing_and_characteristics
+from batch_processing_discovery.cli import main
+from batch_processing_discovery.config import DEFAULT_CSV_IDS
+
+
+def test_main_characteristics(tmp_path, capsys):
+    output_path = tmp_path / "characteristics.json"
+    assert main(["./tests/assets/event_log_6.csv", "--output", str(output_path), "--workers", "2", "--timing"]) == 0
+    characteristics = json.loads(output_path.read_text())
+    # Same characteristics as the library
+    event_log = pd.read_csv("./tests/assets/event_log_6.csv")
+    event_log.drop([DEFAULT_CSV_IDS.batch_id, DEFAULT_CSV_IDS.batch_type], axis=1, inplace=True)
+    expected = discover_batch_processing_and_characteristics(event_log, DEFAULT_CSV_IDS)
+    assert len(characteristics) == len(expected) == 1
+    assert characteristics[0]['activity'] == expected[0]['activity']
+    assert characteristics[0]['batch_frequency'] == expected[0]['batch_frequency']
+    assert characteristics[0]['size_distribution'] == {str(size): count for size, count in expected[0]['size_distribution'].items()}
+    # Timing report in the standard error
+    assert "discovery:" in capsys.readouterr().err
+
+
+def test_main_batched_event_log(tmp_path):
+    # Event log with custom column names
+    event_log = pd.read_csv("./tests/assets/event_log_1.csv").rename(columns={DEFAULT_CSV_IDS.resource: "org:resource"})
+    event_log_path = tmp_path / "event_log.csv"
+    event_log.to_csv(event_log_path, index=False)
+    log_ids_path = tmp_path / "log_ids.json"
+    log_ids_path.write_text(json.dumps({"resource": "org:resource"}))
+    output_path = tmp_path / "batched_event_log.csv"
+    assert main([
+        str(event_log_path), "--log-ids", str(log_ids_path), "--format", "csv", "--output", str(output_path), "--chunk-size", "7"
+    ]) == 0
+    batched_event_log = pd.read_csv(output_path)
+    assert batched_event_log[DEFAULT_CSV_IDS.batch_id].astype('Int64').equals(event_log['expected_id'].astype('Int64'))
+
+
+def test_main_parquet_engine_missing(tmp_path, monkeypatch):
+    # Reported before running the discovery
+    monkeypatch.setattr("batch_processing_discovery.cli._parquet_engine_available", lambda: False)
+    monkeypatch.setattr("batch_processing_discovery.cli.discover_batches_parallel", None)
+    with pytest.raises(SystemExit) as error:
+        main(["./tests/assets/event_log_1.csv", "--format", "parquet", "--output", str(tmp_path / "batched.parquet")])
+    assert error.value.code == 2
+    with pytest.raises(SystemExit):
+        main([str(tmp_path / "event_log.parquet")])
@@ -1,7 +1,7 @@
 import pandas as pd
 
 from batch_processing_discovery.config import DEFAULT_CSV_IDS
-from batch_processing_discovery.discovery import _identify_single_activity_batches, _classify_batch_types
+from batch_processing_discovery.discovery import _identify_single_activity_batches, _classify_batch_types, discover_batches
 
 
 def test__identify_single_activity_batches():
@@ -41,3 +41,22 @@ def test__classify_batch_types():
     # Classify the types of the already identified batches
     _classify_batch_types(event_log, DEFAULT_CSV_IDS)
     assert event_log[DEFAULT_CSV_IDS.batch_type].equals(event_log['expected_type'])
+
+
+def test_discover_batches_missing_resource():
+    # Read input event log
+    event_log = pd.read_csv("./tests/assets/event_log_1.csv")
+    event_log[DEFAULT_CSV_IDS.enabled_time] = pd.to_datetime(event_log[DEFAULT_CSV_IDS.enabled_time], utc=True)
+    event_log[DEFAULT_CSV_IDS.start_time] = pd.to_datetime(event_log[DEFAULT_CSV_IDS.start_time], utc=True)
+    event_log[DEFAULT_CSV_IDS.end_time] = pd.to_datetime(event_log[DEFAULT_CSV_IDS.end_time], utc=True)
+    # Activity instances with no resource are not batched
+    event_log.loc[event_log[DEFAULT_CSV_IDS.resource] == "Jonathan", DEFAULT_CSV_IDS.resource] = None
+    batched_event_log = discover_batches(event_log, DEFAULT_CSV_IDS)
+    assert batched_event_log[DEFAULT_CSV_IDS.batch_id].dtype == "Int64"
+    no_resource = batched_event_log[DEFAULT_CSV_IDS.resource].isna()
+    assert no_resource.any()
+    assert batched_event_log.loc[no_resource, DEFAULT_CSV_IDS.batch_id].isna().all()
+    assert batched_event_log.loc[no_resource, DEFAULT_CSV_IDS.batch_type].isna().all()
+    # The rest of batches are numbered consecutively from 0
+    batch_ids = batched_event_log[DEFAULT_CSV_IDS.batch_id].dropna().unique()
+    assert sorted(batch_ids) == list(range(len(batch_ids)))
@@ -1,7 +1,10 @@
+import numpy as np
 import pandas as pd
+import pytest
 
 from batch_processing_discovery.config import DEFAULT_CSV_IDS
-from batch_processing_discovery.features_table import _compute_features_table, _get_features
+from batch_processing_discovery.features_table import _compute_features_table, _get_features, _get_case_first_start, \
+    FeaturesContext, DEFAULT_FEATURES, register_feature, FEATURE_PROVIDERS
 
 
 def test__compute_features_table():
@@ -13,7 +16,6 @@ def test__compute_features_table():
     event_log[DEFAULT_CSV_IDS.batch_id] = event_log[DEFAULT_CSV_IDS.batch_id].astype('Int64')
     # Compute features table
     features_table = _compute_features_table(
-        event_log=event_log,
         batched_instances=event_log[~pd.isna(event_log[DEFAULT_CSV_IDS.batch_id])],
         log_ids=DEFAULT_CSV_IDS
     )
@@ -125,7 +127,6 @@ def test__get_features():
     event_log[DEFAULT_CSV_IDS.batch_id] = event_log[DEFAULT_CSV_IDS.batch_id].astype('Int64')
     # Assert the features of the start of a batch
     features = _get_features(
-        event_log=event_log,
         instant=pd.Timestamp("2021-01-01T09:30:00+00:00"),
         batch_instance=event_log[event_log[DEFAULT_CSV_IDS.batch_id] == 0],
         outcome=1,
@@ -149,7 +150,6 @@ def test__get_features():
     }
     # Assert the features of the enabling instant in the middle of the accumulation
     features = _get_features(
-        event_log=event_log,
         instant=pd.Timestamp("2021-01-01T08:45:00+00:00"),
         batch_instance=event_log[
             (event_log[DEFAULT_CSV_IDS.batch_id] == 0) &
@@ -176,7 +176,6 @@ def test__get_features():
     }
     # Assert the features of the enabling instant in the middle of the batch ready
     features = _get_features(
-        event_log=event_log,
         instant=pd.Timestamp("2021-01-01T13:00:00+00:00"),
         batch_instance=event_log[event_log[DEFAULT_CSV_IDS.batch_id] == 1],
         outcome=0,
@@ -200,7 +199,6 @@ def test__get_features():
     }
     # Assert the features of the first enabling instant
     features = _get_features(
-        event_log=event_log,
         instant=pd.Timestamp("2021-01-01T16:30:00+00:00"),
         batch_instance=event_log[
             (event_log[DEFAULT_CSV_IDS.batch_id] == 3) &
@@ -225,3 +223,175 @@ def test__get_features():
         # 'minute': 30,
         'outcome': 0
     }
+
+
+def test__compute_features_table_max_cycle_time():
+    # Read input event log
+    event_log = pd.read_csv("./tests/assets/event_log_4.csv")
+    event_log[DEFAULT_CSV_IDS.enabled_time] = pd.to_datetime(event_log[DEFAULT_CSV_IDS.enabled_time], utc=True)
+    event_log[DEFAULT_CSV_IDS.start_time] = pd.to_datetime(event_log[DEFAULT_CSV_IDS.start_time], utc=True)
+    event_log[DEFAULT_CSV_IDS.end_time] = pd.to_datetime(event_log[DEFAULT_CSV_IDS.end_time], utc=True)
+    event_log[DEFAULT_CSV_IDS.batch_id] = event_log[DEFAULT_CSV_IDS.batch_id].astype('Int64')
+    # Compute features table with the index of case start times
+    assert _get_case_first_start(event_log, DEFAULT_CSV_IDS)[0] == pd.Timestamp("2021-01-01T08:00:00+00:00")
+    context = FeaturesContext(event_log, DEFAULT_CSV_IDS)
+    features_table = _compute_features_table(
+        batched_instances=event_log[~pd.isna(event_log[DEFAULT_CSV_IDS.batch_id])],
+        log_ids=DEFAULT_CSV_IDS,
+        features=DEFAULT_FEATURES + ['max_cycle_time'],
+        context=context
+    )
+    # Assert cycle time of the positive observations
+    assert list(features_table[features_table['outcome'] == 1]['max_cycle_time']) == [
+        pd.Timedelta(hours=1, seconds=1800).total_seconds(),
+        pd.Timedelta(hours=6).total_seconds(),
+        pd.Timedelta(hours=8).total_seconds(),
+        pd.Timedelta(hours=9).total_seconds(),
+    ]
+    # Assert cycle time of a non-activating instant
+    features = _get_features(
+        instant=pd.Timestamp("2021-01-01T16:30:00+00:00"),
+        batch_instance=event_log[(event_log[DEFAULT_CSV_IDS.batch_id] == 3) & (event_log[DEFAULT_CSV_IDS.case] == 0)],
+        outcome=0,
+        log_ids=DEFAULT_CSV_IDS,
+        features=['max_cycle_time'],
+        context=context
+    )
+    assert features['max_cycle_time'] == pd.Timedelta(hours=8, seconds=1800)
+
+
+def test__compute_features_table_registered_features():
+    # Read input event log
+    event_log = pd.read_csv("./tests/assets/event_log_4.csv")
+    event_log[DEFAULT_CSV_IDS.enabled_time] = pd.to_datetime(event_log[DEFAULT_CSV_IDS.enabled_time], utc=True)
+    event_log[DEFAULT_CSV_IDS.start_time] = pd.to_datetime(event_log[DEFAULT_CSV_IDS.start_time], utc=True)
+    event_log[DEFAULT_CSV_IDS.end_time] = pd.to_datetime(event_log[DEFAULT_CSV_IDS.end_time], utc=True)
+    event_log[DEFAULT_CSV_IDS.batch_id] = event_log[DEFAULT_CSV_IDS.batch_id].astype('Int64')
+    batched_instances = event_log[~pd.isna(event_log[DEFAULT_CSV_IDS.batch_id])]
+    # Register a new feature: number of batch cases enabled at the instant, doubled
+    register_feature('double_batch_size', lambda observations: (observations.last - observations.first + 1) * 2)
+    try:
+        features_table = _compute_features_table(
+            batched_instances=batched_instances,
+            log_ids=DEFAULT_CSV_IDS,
+            features=['batch_size', 'double_batch_size', 'day_of_month', 'minute']
+        )
+    finally:
+        del FEATURE_PROVIDERS['double_batch_size']
+    # Only the requested features are computed, in the requested order
+    assert list(features_table.columns) == [
+        DEFAULT_CSV_IDS.batch_id, DEFAULT_CSV_IDS.batch_type, DEFAULT_CSV_IDS.activity, DEFAULT_CSV_IDS.resource, 'instant',
+        'batch_size', 'double_batch_size', 'day_of_month', 'minute', 'outcome'
+    ]
+    assert (features_table['double_batch_size'] == features_table['batch_size'] * 2).all()
+    positive_observations = features_table[features_table['outcome'] == 1]
+    assert list(positive_observations['day_of_month']) == [1, 1, 1, 1]
+    assert list(positive_observations['minute']) == [30, 0, 0, 0]
+    # Features returned as a Series indexed by labels other than the positions
+    register_feature('labeled_batch_size', lambda observations: pd.Series(
+        observations.last - observations.first + 1, index=np.arange(len(observations.first)) + 10
+    ))
+    try:
+        features = _get_features(
+            instant=pd.Timestamp("2021-01-01T09:30:00+00:00"),
+            batch_instance=event_log[event_log[DEFAULT_CSV_IDS.batch_id] == 0],
+            outcome=1,
+            log_ids=DEFAULT_CSV_IDS,
+            features=['labeled_batch_size']
+        )
+    finally:
+        del FEATURE_PROVIDERS['labeled_batch_size']
+    assert features['labeled_batch_size'] == 3
+    # Unknown features, or features needing the full event log without it, are reported
+    with pytest.raises(ValueError):
+        _compute_features_table(batched_instances=batched_instances, log_ids=DEFAULT_CSV_IDS, features=['unknown'])
+    with pytest.raises(ValueError):
+        _compute_features_table(batched_instances=batched_instances, log_ids=DEFAULT_CSV_IDS, features=['max_cycle_time'])
+
+
+def test__compute_features_table_queue_features():
+    # Read input event log
+    event_log = pd.read_csv("./tests/assets/event_log_4.csv")
+    event_log[DEFAULT_CSV_IDS.enabled_time] = pd.to_datetime(event_log[DEFAULT_CSV_IDS.enabled_time], utc=True)
+    event_log[DEFAULT_CSV_IDS.start_time] = pd.to_datetime(event_log[DEFAULT_CSV_IDS.start_time], utc=True)
+    event_log[DEFAULT_CSV_IDS.end_time] = pd.to_datetime(event_log[DEFAULT_CSV_IDS.end_time], utc=True)
+    event_log[DEFAULT_CSV_IDS.batch_id] = event_log[DEFAULT_CSV_IDS.batch_id].astype('Int64')
+    context = FeaturesContext(event_log, DEFAULT_CSV_IDS)
+    # All the batch instances are fired with the three cases waiting, and their resource idle
+    features_table = _compute_features_table(
+        batched_instances=event_log[~pd.isna(event_log[DEFAULT_CSV_IDS.batch_id])],
+        log_ids=DEFAULT_CSV_IDS,
+        features=['queue_length', 'resource_workload'],
+        context=context
+    )
+    positive_observations = features_table[features_table['outcome'] == 1]
+    assert list(positive_observations['queue_length']) == [3, 3, 3, 3]
+    assert list(positive_observations['resource_workload']) == [0, 0, 0, 0]
+    # In the non-activating instants, only the batch cases enabled so far are waiting
+    features_table = _compute_features_table(
+        batched_instances=event_log[~pd.isna(event_log[DEFAULT_CSV_IDS.batch_id])],
+        log_ids=DEFAULT_CSV_IDS,
+        features=['batch_size', 'queue_length'],
+        context=context
+    )
+    negative_observations = features_table[features_table['outcome'] == 0]
+    assert (negative_observations['queue_length'] == negative_observations['batch_size']).all()
+    # Jolyne processing B (from 10:00 to 11:30) before any case of C is enabled
+    features = _get_features(
+        instant=pd.Timestamp("2021-01-01T11:00:00+00:00"),
+        batch_instance=event_log[event_log[DEFAULT_CSV_IDS.batch_id] == 1],
+        outcome=0,
+        log_ids=DEFAULT_CSV_IDS,
+        features=['queue_length', 'resource_workload'],
+        context=context
+    )
+    assert features['queue_length'] == 0
+    assert features['resource_workload'] == 1
+    # Jolyne idle, with two cases of C waiting
+    features = _get_features(
+        instant=pd.Timestamp("2021-01-01T12:15:00+00:00"),
+        batch_instance=event_log[event_log[DEFAULT_CSV_IDS.batch_id] == 1],
+        outcome=0,
+        log_ids=DEFAULT_CSV_IDS,
+        features=['queue_length', 'resource_workload'],
+        context=context
+    )
+    assert features['queue_length'] == 2
+    assert features['resource_workload'] == 0
+
+
+def test__compute_features_table_resource_workload_zero_duration():
+    # Parallel batch instance of three cases starting and ending at the same instant
+    event_log = pd.DataFrame({
+        DEFAULT_CSV_IDS.case: [0, 1, 2],
+        DEFAULT_CSV_IDS.activity: ["A", "A", "A"],
+        DEFAULT_CSV_IDS.resource: ["Jolyne", "Jolyne", "Jolyne"],
+        DEFAULT_CSV_IDS.enabled_time: pd.to_datetime(
+            ["2021-01-01T08:00:00+00:00", "2021-01-01T08:30:00+00:00", "2021-01-01T09:00:00+00:00"], utc=True
+        ),
+        DEFAULT_CSV_IDS.start_time: pd.to_datetime(["2021-01-01T10:00:00+00:00"] * 3, utc=True),
+        DEFAULT_CSV_IDS.end_time: pd.to_datetime(["2021-01-01T10:00:00+00:00"] * 3, utc=True),
+        DEFAULT_CSV_IDS.batch_id: pd.array([0, 0, 0], dtype='Int64'),
+        DEFAULT_CSV_IDS.batch_type: ["Parallel"] * 3,
+    })
+    context = FeaturesContext(event_log, DEFAULT_CSV_IDS)
+    features_table = _compute_features_table(
+        batched_instances=event_log,
+        log_ids=DEFAULT_CSV_IDS,
+        features=['resource_workload'],
+        context=context
+    )
+    # At the firing instant (start == end == instant) the resource is idle
+    positive_observations = features_table[features_table['outcome'] == 1]
+    assert list(positive_observations['resource_workload']) == [0]
+    assert (features_table['resource_workload'] == 0).all()
+    # After it, the zero-duration instances are not in progress either
+    features = _get_features(
+        instant=pd.Timestamp("2021-01-01T10:30:00+00:00"),
+        batch_instance=event_log,
+        outcome=0,
+        log_ids=DEFAULT_CSV_IDS,
+        features=['resource_workload'],
+        context=context
+    )
+    assert features['resource_workload'] == 0
@@ -0,0 +1,32 @@
+import subprocess
+import sys
+
+
+def _loaded_modules(statement: str) -> set:
+    # Run the statement in a new interpreter, to not depend on the modules already imported by other tests
+    output = subprocess.run(
+        [sys.executable, "-c", "import sys\n{}\nprint(' '.join(sys.modules))".format(statement)],
+        capture_output=True, text=True, check=True
+    ).stdout
+    return set(output.split())
+
+
+def test_lazy_imports():
+    # Neither the discovery nor the characteristics load the rules discovery and compilation dependencies at import time
+    modules = _loaded_modules(
+        "import batch_processing_discovery.discovery\n"
+        "import batch_processing_discovery.batch_characteristics\n"
+        "import batch_processing_discovery.cli"
+    )
+    assert "pandas" in modules
+    assert "wittgenstein" not in modules
+    assert "numba" not in modules
+    # Tagging the batches of a small event log loads neither the rules discovery dependencies nor numba
+    modules = _loaded_modules(
+        "import pandas as pd\n"
+        "from batch_processing_discovery.config import DEFAULT_CSV_IDS\n"
+        "from batch_processing_discovery.discovery import discover_batches\n"
+        "discover_batches(pd.read_csv('./tests/assets/event_log_1.csv'), DEFAULT_CSV_IDS)"
+    )
+    assert "wittgenstein" not in modules
+    assert "numba" not in modules
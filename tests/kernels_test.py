@@ -0,0 +1,104 @@
+import sys
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from batch_processing_discovery import kernels
+from batch_processing_discovery.kernels import _sweep_line_batches_python, _to_int64_ns
+
+KERNEL_IMPLEMENTATIONS = [pytest.param("python", id="python")] + [
+    pytest.param("numba", id="numba", marks=pytest.mark.skipif(kernels._get_numba_sweep_line() is None, reason="numba not available"))
+]
+
+
+def _get_sweep_line_kernel(implementation: str):
+    if implementation == "numba":
+        return kernels._get_numba_sweep_line()
+    return _sweep_line_batches_python
+
+
+def _reference_sweep_line(enabled: list, starts: list, ends: list, max_sequential_gap: int, batch_min_size: int) -> list:
+    # Sweep line as implemented before the kernels, over events sorted by start time
+    batches, batch_instance = [], []
+    batch_instance_start, batch_instance_end = None, None
+    for index in range(len(starts)):
+        if len(batch_instance) == 0:
+            batch_instance = [index]
+            batch_instance_start, batch_instance_end = starts[index], ends[index]
+        elif enabled[index] <= batch_instance_start and (starts[index] - batch_instance_end) <= max_sequential_gap:
+            batch_instance += [index]
+            batch_instance_end = max(batch_instance_end, ends[index])
+        else:
+            if len(batch_instance) >= batch_min_size:
+                batches += [batch_instance]
+            batch_instance = [index]
+            batch_instance_start, batch_instance_end = starts[index], ends[index]
+    if len(batch_instance) >= batch_min_size:
+        batches += [batch_instance]
+    labels = [-1] * len(starts)
+    for batch_id, batch_indexes in enumerate(batches):
+        for index in batch_indexes:
+            labels[index] = batch_id
+    return labels
+
+
+def _random_events(rng: np.random.Generator, num_events: int) -> tuple:
+    # Events with many ties and overlaps, to exercise all the branches of the sweep line
+    starts = np.sort(rng.integers(0, 50, num_events)).astype(np.int64)
+    ends = starts + rng.integers(0, 6, num_events)
+    enabled = starts - rng.integers(0, 20, num_events)
+    return enabled, starts, ends
+
+
+@pytest.mark.parametrize("implementation", KERNEL_IMPLEMENTATIONS)
+def test__sweep_line_batches_parity(implementation):
+    sweep_line_batches = _get_sweep_line_kernel(implementation)
+    rng = np.random.default_rng(42)
+    for num_events in [0, 1, 2, 3, 10, 100]:
+        for _ in range(20):
+            enabled, starts, ends = _random_events(rng, num_events)
+            for max_sequential_gap in [0, 3]:
+                for batch_min_size in [2, 3, 4]:
+                    labels = sweep_line_batches(enabled, starts, ends, max_sequential_gap, batch_min_size)
+                    assert labels.dtype == np.int64
+                    assert labels.tolist() == _reference_sweep_line(
+                        enabled.tolist(), starts.tolist(), ends.tolist(), max_sequential_gap, batch_min_size
+                    )
+
+
+def test__to_int64_ns():
+    timestamps = pd.Series(pd.to_datetime(["2021-01-01T10:00:00+02:00", "2021-01-01T08:00:01+00:00"], utc=True))
+    assert _to_int64_ns(timestamps).tolist() == [1609488000000000000, 1609488001000000000]
+    # Non-nanosecond resolutions are transformed to ns
+    assert _to_int64_ns(timestamps.astype("datetime64[us, UTC]")).tolist() == [1609488000000000000, 1609488001000000000]
+
+
+def test__sweep_line_batches_unimportable_numba(monkeypatch):
+    # Numba installed but failing to import (e.g., not supporting the installed NumPy version)
+    monkeypatch.setattr(kernels, "NUMBA_AVAILABLE", True)
+    monkeypatch.setitem(sys.modules, "numba", None)
+    kernels._get_numba_sweep_line.cache_clear()
+    try:
+        assert kernels._get_numba_sweep_line() is None
+        sweep_line_batches = kernels._get_sweep_line_kernel(kernels.NUMBA_MIN_EVENTS)
+        assert sweep_line_batches is _sweep_line_batches_python
+        enabled, starts, ends = _random_events(np.random.default_rng(42), 10)
+        assert sweep_line_batches(enabled, starts, ends, 0, 2).tolist() == _reference_sweep_line(
+            enabled.tolist(), starts.tolist(), ends.tolist(), 0, 2
+        )
+    finally:
+        kernels._get_numba_sweep_line.cache_clear()
+
+
+@pytest.mark.skipif(not kernels.NUMBA_AVAILABLE, reason="numba not available")
+def test__get_sweep_line_kernel_threshold():
+    kernels._get_numba_sweep_line.cache_clear()
+    try:
+        # Small event logs do not pay the import of Numba
+        assert kernels._get_sweep_line_kernel(kernels.NUMBA_MIN_EVENTS - 1) is _sweep_line_batches_python
+        # Large ones do, and from then on the compiled kernel is used for any size
+        assert kernels._get_sweep_line_kernel(kernels.NUMBA_MIN_EVENTS) is kernels._get_numba_sweep_line()
+        assert kernels._get_sweep_line_kernel(10) is kernels._get_numba_sweep_line()
+    finally:
+        kernels._get_numba_sweep_line.cache_clear()
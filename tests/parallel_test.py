@@ -0,0 +1,62 @@
+import pandas as pd
+
+from batch_processing_discovery.config import DEFAULT_CSV_IDS
+from batch_processing_discovery.discovery import discover_batches
+from batch_processing_discovery.parallel import _partition_event_log, discover_batches_parallel
+
+
+def _read_event_log(path: str) -> pd.DataFrame:
+    event_log = pd.read_csv(path)
+    event_log[DEFAULT_CSV_IDS.enabled_time] = pd.to_datetime(event_log[DEFAULT_CSV_IDS.enabled_time], utc=True)
+    event_log[DEFAULT_CSV_IDS.start_time] = pd.to_datetime(event_log[DEFAULT_CSV_IDS.start_time], utc=True)
+    event_log[DEFAULT_CSV_IDS.end_time] = pd.to_datetime(event_log[DEFAULT_CSV_IDS.end_time], utc=True)
+    return event_log
+
+
+def test__partition_event_log():
+    event_log = _read_event_log("./tests/assets/event_log_1.csv")
+    num_pairs = len(event_log[[DEFAULT_CSV_IDS.resource, DEFAULT_CSV_IDS.activity]].drop_duplicates())
+    for num_partitions in [1, 2, 3, num_pairs + 5]:
+        partitions = _partition_event_log(event_log, DEFAULT_CSV_IDS, num_partitions)
+        assert 0 < len(partitions) <= min(num_partitions, num_pairs)
+        # All activity instances in exactly one partition
+        assert sorted(position for partition in partitions for position in partition) == list(range(len(event_log)))
+        # Each pair in only one partition, and partitions following the sorted order of the pairs
+        pairs = [
+            list(event_log.iloc[partition][[DEFAULT_CSV_IDS.resource, DEFAULT_CSV_IDS.activity]].itertuples(index=False))
+            for partition in partitions
+        ]
+        flat_pairs = [pair for partition_pairs in pairs for pair in partition_pairs]
+        assert flat_pairs == sorted(flat_pairs)
+
+
+def test_discover_batches_parallel():
+    for path in ["./tests/assets/event_log_1.csv", "./tests/assets/event_log_3.csv", "./tests/assets/event_log_6.csv"]:
+        event_log = _read_event_log(path).drop([DEFAULT_CSV_IDS.batch_id, DEFAULT_CSV_IDS.batch_type], axis=1, errors="ignore")
+        expected = discover_batches(event_log, DEFAULT_CSV_IDS)
+        for workers in [1, 2, 3]:
+            batched_event_log = discover_batches_parallel(event_log, DEFAULT_CSV_IDS, workers=workers)
+            pd.testing.assert_frame_equal(batched_event_log, expected)
+
+
+def test_discover_batches_parallel_no_pairs():
+    event_log = _read_event_log("./tests/assets/event_log_1.csv")
+    # Empty event log
+    empty_event_log = event_log.iloc[:0]
+    pd.testing.assert_frame_equal(
+        discover_batches_parallel(empty_event_log, DEFAULT_CSV_IDS, workers=2),
+        discover_batches(empty_event_log, DEFAULT_CSV_IDS)
+    )
+    assert _partition_event_log(empty_event_log, DEFAULT_CSV_IDS, 2) == []
+    # Activity instances with no resource are not in any partition
+    event_log[DEFAULT_CSV_IDS.resource] = event_log[DEFAULT_CSV_IDS.resource].where(
+        event_log[DEFAULT_CSV_IDS.resource] != "Jonathan", None
+    )
+    partitions = _partition_event_log(event_log, DEFAULT_CSV_IDS, 2)
+    assert sorted(position for partition in partitions for position in partition) == list(
+        (~event_log[DEFAULT_CSV_IDS.resource].isna()).to_numpy().nonzero()[0]
+    )
+    pd.testing.assert_frame_equal(
+        discover_batches_parallel(event_log, DEFAULT_CSV_IDS, workers=2),
+        discover_batches(event_log, DEFAULT_CSV_IDS)
+    )
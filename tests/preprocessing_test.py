@@ -0,0 +1,153 @@
+import warnings
+
+import pandas as pd
+import pytest
+
+from batch_processing_discovery.batch_characteristics import discover_batch_processing_and_characteristics
+from batch_processing_discovery.config import DEFAULT_CSV_IDS
+from batch_processing_discovery.discovery import discover_batches
+from batch_processing_discovery.features_table import _compute_features_table
+from batch_processing_discovery.preprocessing import normalize_timestamps
+from batch_processing_discovery.sampling import approximate_batch_processing_and_characteristics
+
+
+def _raw_event_log() -> pd.DataFrame:
+    # One valid activity instance, one enabled after its start, one ending before its start, and one with no start time
+    return pd.DataFrame(
+        data={
+            DEFAULT_CSV_IDS.case: [0, 1, 2, 3],
+            DEFAULT_CSV_IDS.enabled_time: [
+                "2021-01-01T10:00:00+02:00", "2021-01-01T09:00:00+00:00", "2021-01-01T07:00:00+00:00", "2021-01-01T07:00:00+00:00"
+            ],
+            DEFAULT_CSV_IDS.start_time: [
+                "2021-01-01T09:00:00+00:00", "2021-01-01T08:00:00+00:00", "2021-01-01T09:00:00+00:00", None
+            ],
+            DEFAULT_CSV_IDS.end_time: [
+                "2021-01-01T09:30:00+00:00", "2021-01-01T09:30:00+00:00", "2021-01-01T08:30:00+00:00", "2021-01-01T09:30:00+00:00"
+            ],
+        },
+        index=[10, 11, 12, 13]
+    )
+
+
+def test_normalize_timestamps_repair():
+    event_log = _raw_event_log()
+    normalized = normalize_timestamps(event_log, DEFAULT_CSV_IDS)
+    for column in [DEFAULT_CSV_IDS.enabled_time, DEFAULT_CSV_IDS.start_time, DEFAULT_CSV_IDS.end_time]:
+        assert normalized[column].dtype == "datetime64[ns, UTC]"
+    # Original event log is not modified
+    assert event_log[DEFAULT_CSV_IDS.start_time].dtype == object
+    # Instance with no start time is dropped
+    assert normalized.index.tolist() == [10, 11, 12]
+    # Time zones converted to UTC
+    assert normalized.loc[10, DEFAULT_CSV_IDS.enabled_time] == pd.Timestamp("2021-01-01T08:00:00+00:00")
+    # Enabled time set to the start time
+    assert normalized.loc[11, DEFAULT_CSV_IDS.enabled_time] == pd.Timestamp("2021-01-01T08:00:00+00:00")
+    # Start and end times swapped
+    assert normalized.loc[12, DEFAULT_CSV_IDS.start_time] == pd.Timestamp("2021-01-01T08:30:00+00:00")
+    assert normalized.loc[12, DEFAULT_CSV_IDS.end_time] == pd.Timestamp("2021-01-01T09:00:00+00:00")
+    assert normalized.loc[12, DEFAULT_CSV_IDS.enabled_time] == pd.Timestamp("2021-01-01T07:00:00+00:00")
+    # Already normalized and valid event log is returned without copying it
+    assert normalize_timestamps(normalized, DEFAULT_CSV_IDS) is normalized
+
+
+def test_normalize_timestamps_policies():
+    event_log = _raw_event_log()
+    # Drop all invalid instances
+    assert normalize_timestamps(event_log, DEFAULT_CSV_IDS, "drop").index.tolist() == [10]
+    # Keep them as they are
+    ignored = normalize_timestamps(event_log, DEFAULT_CSV_IDS, "ignore")
+    assert ignored.index.tolist() == [10, 11, 12, 13]
+    assert pd.isna(ignored.loc[13, DEFAULT_CSV_IDS.start_time])
+    # Raise an error
+    with pytest.raises(ValueError):
+        normalize_timestamps(event_log, DEFAULT_CSV_IDS, "raise")
+    with pytest.raises(ValueError):
+        normalize_timestamps(event_log, DEFAULT_CSV_IDS, "unknown")
+
+
+def test_normalize_timestamps_mixed_types():
+    event_log = _raw_event_log().iloc[:1]
+    # Parsed timestamps in different time zones (and naive ones, considered UTC)
+    event_log[DEFAULT_CSV_IDS.enabled_time] = pd.to_datetime(event_log[DEFAULT_CSV_IDS.enabled_time])
+    event_log[DEFAULT_CSV_IDS.start_time] = pd.to_datetime(event_log[DEFAULT_CSV_IDS.start_time], utc=True).dt.tz_localize(None)
+    event_log[DEFAULT_CSV_IDS.end_time] = pd.to_datetime(event_log[DEFAULT_CSV_IDS.end_time], utc=True).astype("datetime64[us, UTC]")
+    normalized = normalize_timestamps(event_log, DEFAULT_CSV_IDS, "raise")
+    assert normalized[DEFAULT_CSV_IDS.enabled_time].dtype == "datetime64[ns, UTC]"
+    assert normalized.iloc[0][DEFAULT_CSV_IDS.enabled_time] == pd.Timestamp("2021-01-01T08:00:00+00:00")
+    assert normalized.iloc[0][DEFAULT_CSV_IDS.start_time] == pd.Timestamp("2021-01-01T09:00:00+00:00")
+    assert normalized.iloc[0][DEFAULT_CSV_IDS.end_time] == pd.Timestamp("2021-01-01T09:30:00+00:00")
+
+
+def test_normalize_timestamps_common_time_zone():
+    event_log = pd.read_csv("./tests/assets/event_log_4.csv").drop([DEFAULT_CSV_IDS.batch_id, DEFAULT_CSV_IDS.batch_type], axis=1)
+    columns = [DEFAULT_CSV_IDS.enabled_time, DEFAULT_CSV_IDS.start_time, DEFAULT_CSV_IDS.end_time]
+    for column in columns:
+        event_log[column] = pd.to_datetime(event_log[column], utc=True).dt.tz_convert("Europe/Madrid")
+    # Same event log stored with microsecond precision (e.g., read from Parquet)
+    us_event_log = event_log.copy()
+    for column in columns:
+        us_event_log[column] = us_event_log[column].dt.as_unit("us")
+    normalized = normalize_timestamps(us_event_log, DEFAULT_CSV_IDS, "raise")
+    for column in columns:
+        assert normalized[column].dtype == "datetime64[ns, Europe/Madrid]"
+    pd.testing.assert_frame_equal(normalized, event_log)
+    # The features of the firing rules do not depend on the precision
+    batched_event_log = discover_batches(event_log, DEFAULT_CSV_IDS)
+    us_batched_event_log = discover_batches(us_event_log, DEFAULT_CSV_IDS)
+    pd.testing.assert_frame_equal(us_batched_event_log, batched_event_log)
+    features_table = _compute_features_table(
+        batched_event_log[~pd.isna(batched_event_log[DEFAULT_CSV_IDS.batch_id])], DEFAULT_CSV_IDS
+    )
+    assert features_table[features_table['outcome'] == 1]['daily_hour'].tolist() == [15, 10, 17, 18]
+    # Time zone naive timestamps are kept naive
+    naive_event_log = event_log.copy()
+    for column in columns:
+        naive_event_log[column] = naive_event_log[column].dt.tz_localize(None).dt.as_unit("us")
+    naive_batched_event_log = discover_batches(naive_event_log, DEFAULT_CSV_IDS)
+    for column in columns:
+        assert naive_batched_event_log[column].dtype == "datetime64[ns]"
+    assert naive_batched_event_log[DEFAULT_CSV_IDS.batch_id].equals(batched_event_log[DEFAULT_CSV_IDS.batch_id])
+
+
+def test_discover_batches_unparsed_timestamps():
+    event_log = pd.read_csv("./tests/assets/event_log_1.csv")
+    parsed_event_log = event_log.copy()
+    for column in [DEFAULT_CSV_IDS.enabled_time, DEFAULT_CSV_IDS.start_time, DEFAULT_CSV_IDS.end_time]:
+        parsed_event_log[column] = pd.to_datetime(parsed_event_log[column], utc=True)
+    batched_event_log = discover_batches(event_log, DEFAULT_CSV_IDS)
+    parsed_batched_event_log = discover_batches(parsed_event_log, DEFAULT_CSV_IDS)
+    pd.testing.assert_frame_equal(batched_event_log, parsed_batched_event_log)
+
+
+def test_normalize_timestamps_warnings():
+    event_log = _raw_event_log()
+    # Repaired and dropped activity instances are reported
+    with pytest.warns(UserWarning, match="2 repaired .* and 1 dropped"):
+        normalize_timestamps(event_log, DEFAULT_CSV_IDS)
+    with pytest.warns(UserWarning, match="3 activity instances with invalid timestamps dropped"):
+        normalize_timestamps(event_log, DEFAULT_CSV_IDS, "drop")
+    # No warning for valid event logs
+    with warnings.catch_warnings():
+        warnings.simplefilter("error")
+        normalize_timestamps(event_log.iloc[:1], DEFAULT_CSV_IDS)
+
+
+def test_invalid_timestamps_policy_pass_through():
+    event_log = pd.read_csv("./tests/assets/event_log_6.csv")
+    event_log.drop([DEFAULT_CSV_IDS.batch_id, DEFAULT_CSV_IDS.batch_type], axis=1, inplace=True)
+    # Activity instance ending before it starts
+    event_log.loc[0, [DEFAULT_CSV_IDS.start_time, DEFAULT_CSV_IDS.end_time]] = [
+        event_log.loc[0, DEFAULT_CSV_IDS.end_time], event_log.loc[0, DEFAULT_CSV_IDS.start_time]
+    ]
+    with pytest.raises(ValueError):
+        discover_batch_processing_and_characteristics(event_log, DEFAULT_CSV_IDS, invalid_timestamps="raise")
+    with pytest.raises(ValueError):
+        approximate_batch_processing_and_characteristics(event_log, DEFAULT_CSV_IDS, invalid_timestamps="raise")
+    with warnings.catch_warnings(record=True) as records:
+        warnings.simplefilter("always")
+        characteristics = approximate_batch_processing_and_characteristics(
+            event_log, DEFAULT_CSV_IDS, sample_fraction=1.0, invalid_timestamps="drop", seed=0
+        )
+    assert any("1 activity instances with invalid timestamps dropped" in str(record.message) for record in records)
+    assert characteristics[0]['sample']['total_activity_instances'] == 56
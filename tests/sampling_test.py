@@ -0,0 +1,65 @@
+import pandas as pd
+import pytest
+
+from batch_processing_discovery.batch_characteristics import discover_batch_processing_and_characteristics
+from batch_processing_discovery.config import DEFAULT_CSV_IDS
+from batch_processing_discovery.sampling import approximate_batch_processing_and_characteristics
+
+
+def _read_event_log() -> pd.DataFrame:
+    event_log = pd.read_csv("./tests/assets/event_log_6.csv")
+    event_log.drop([DEFAULT_CSV_IDS.batch_id, DEFAULT_CSV_IDS.batch_type], axis=1, inplace=True)
+    event_log[DEFAULT_CSV_IDS.enabled_time] = pd.to_datetime(event_log[DEFAULT_CSV_IDS.enabled_time], utc=True)
+    event_log[DEFAULT_CSV_IDS.start_time] = pd.to_datetime(event_log[DEFAULT_CSV_IDS.start_time], utc=True)
+    event_log[DEFAULT_CSV_IDS.end_time] = pd.to_datetime(event_log[DEFAULT_CSV_IDS.end_time], utc=True)
+    return event_log
+
+
+def _replicate_resources(event_log: pd.DataFrame, times: int) -> pd.DataFrame:
+    # Copy the activity instances of the log, performed by other resources
+    copies = []
+    for i in range(times):
+        copy = event_log.copy()
+        copy[DEFAULT_CSV_IDS.resource] = copy[DEFAULT_CSV_IDS.resource] + "_{}".format(i)
+        copy[DEFAULT_CSV_IDS.case] = copy[DEFAULT_CSV_IDS.case].astype(str) + "_{}".format(i)
+        copies += [copy]
+    return pd.concat(copies, ignore_index=True)
+
+
+def test_approximate_batch_processing_and_characteristics_full_sample():
+    event_log = _read_event_log()
+    # Sampling all the resources gives the exact characteristics
+    exact = discover_batch_processing_and_characteristics(event_log, DEFAULT_CSV_IDS)
+    approximate = approximate_batch_processing_and_characteristics(event_log, DEFAULT_CSV_IDS, sample_fraction=1.0, seed=0)
+    assert len(approximate) == len(exact) == 1
+    batch = approximate[0]
+    assert batch['activity'] == exact[0]['activity']
+    assert batch['batch_frequency'] == exact[0]['batch_frequency']
+    assert batch['size_distribution'] == exact[0]['size_distribution']
+    assert batch['duration_distribution'] == pytest.approx(exact[0]['duration_distribution'])
+    assert batch['confidence_intervals']['batch_frequency'] == [batch['batch_frequency']] * 2
+    assert batch['sample'] == {'resources': 2, 'total_resources': 2, 'activity_instances': 56, 'total_activity_instances': 56}
+
+
+def test_approximate_batch_processing_and_characteristics():
+    event_log = _replicate_resources(_read_event_log(), 5)
+    exact = discover_batch_processing_and_characteristics(event_log, DEFAULT_CSV_IDS)[0]
+    # Sample half of the resources (of B)
+    batch = approximate_batch_processing_and_characteristics(event_log, DEFAULT_CSV_IDS, sample_fraction=0.5, seed=0)[0]
+    assert batch['activity'] == 'B'
+    assert batch['sample']['resources'] == 5
+    assert batch['sample']['total_resources'] == 10
+    assert batch['sample']['total_activity_instances'] == 280
+    # Size distribution extrapolated to the full log
+    assert sum(batch['size_distribution'].values()) == sum(exact['size_distribution'].values())
+    # Estimates within their confidence intervals
+    intervals = batch['confidence_intervals']
+    assert intervals['batch_frequency'][0] <= batch['batch_frequency'] <= intervals['batch_frequency'][1]
+    for size, count in batch['size_distribution'].items():
+        assert intervals['size_distribution'][size][0] <= count <= intervals['size_distribution'][size][1]
+    for size, factor in batch['duration_distribution'].items():
+        assert intervals['duration_distribution'][size][0] <= factor <= intervals['duration_distribution'][size][1]
+    # With only one resource sampled, the intervals cannot be estimated
+    batch = approximate_batch_processing_and_characteristics(event_log, DEFAULT_CSV_IDS, sample_fraction=0.01, seed=0)[0]
+    assert batch['sample']['resources'] == 1
+    assert batch['confidence_intervals'] is None
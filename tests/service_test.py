@@ -0,0 +1,66 @@
+import urllib.request
+from concurrent.futures.process import BrokenProcessPool
+
+import pandas as pd
+import pytest
+
+from batch_processing_discovery.config import DEFAULT_CSV_IDS
+from batch_processing_discovery.discovery import discover_batches
+from batch_processing_discovery import service as service_module
+from batch_processing_discovery.service import BatchDiscoveryService, serve
+
+
+def _read_event_log(path: str) -> pd.DataFrame:
+    event_log = pd.read_csv(path).drop([DEFAULT_CSV_IDS.batch_id, DEFAULT_CSV_IDS.batch_type], axis=1, errors="ignore")
+    event_log[DEFAULT_CSV_IDS.enabled_time] = pd.to_datetime(event_log[DEFAULT_CSV_IDS.enabled_time], utc=True)
+    event_log[DEFAULT_CSV_IDS.start_time] = pd.to_datetime(event_log[DEFAULT_CSV_IDS.start_time], utc=True)
+    event_log[DEFAULT_CSV_IDS.end_time] = pd.to_datetime(event_log[DEFAULT_CSV_IDS.end_time], utc=True)
+    return event_log
+
+
+def test_batch_discovery_service():
+    event_logs = {
+        "log_1": _read_event_log("./tests/assets/event_log_1.csv"),
+        "log_3": _read_event_log("./tests/assets/event_log_3.csv"),
+        "log_6": _read_event_log("./tests/assets/event_log_6.csv"),
+        "empty": _read_event_log("./tests/assets/event_log_6.csv").iloc[:0],
+    }
+    with BatchDiscoveryService(workers=2) as service:
+        # Many event logs, all of them returned with the same result as the sequential discovery
+        results = dict(service.discover_many(event_logs))
+        assert set(results) == set(event_logs)
+        for name, event_log in event_logs.items():
+            pd.testing.assert_frame_equal(results[name], discover_batches(event_log, DEFAULT_CSV_IDS))
+        # One event log, reusing the pool
+        pd.testing.assert_frame_equal(
+            service.discover(event_logs["log_1"]), discover_batches(event_logs["log_1"], DEFAULT_CSV_IDS)
+        )
+
+
+def test_serve():
+    event_log = pd.read_csv("./tests/assets/event_log_1.csv")
+    with BatchDiscoveryService(workers=1) as service:
+        server = serve(service, port=0)
+        try:
+            request = urllib.request.Request(
+                "http://{}:{}".format(*server.server_address),
+                data=event_log.to_csv(index=False).encode(),
+                method="POST"
+            )
+            with urllib.request.urlopen(request) as response:
+                batched_event_log = pd.read_csv(response)
+        finally:
+            server.shutdown()
+            server.server_close()
+    assert batched_event_log[DEFAULT_CSV_IDS.batch_id].astype('Int64').equals(event_log['expected_id'].astype('Int64'))
+
+
+def _failing_warm_up():
+    raise RuntimeError("Warm-up failure")
+
+
+def test_batch_discovery_service_warm_up_failure(monkeypatch):
+    # A worker failing to warm up is reported when creating the service
+    monkeypatch.setattr(service_module, "_warm_up", _failing_warm_up)
+    with pytest.raises(BrokenProcessPool):
+        BatchDiscoveryService(workers=2)